@@ -16,19 +16,83 @@ PLATFORM_KEYWORDS = {
     "linux": ["linux", "ubuntu", "debian", "centos", "fedora"],
 }
 
+# 自适应检查：根据各包的发布节奏决定检查间隔，只检查到期的包
+ADAPTIVE_CHECK_INTERVAL = True
+
+# 检查间隔 = 发布周期 * 系数，并限制在最小/最大间隔（小时）之间
+CHECK_INTERVAL_FACTOR = 0.25
+CHECK_INTERVAL_MIN_HOURS = 1
+CHECK_INTERVAL_MAX_HOURS = 24 * 7
+
+# 无论是否到期都强制检查的包
+FORCE_CHECK_PACKAGES = []
+
+# 熔断：连续失败（404 或网络错误）达到阈值后暂停检查该包
+# 熔断时长从 CIRCUIT_BASE_OPEN_HOURS 开始，每次探测失败翻倍，最长 CIRCUIT_MAX_OPEN_HOURS
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_BASE_OPEN_HOURS = 24
+CIRCUIT_MAX_OPEN_HOURS = 24 * 30
+
 # 并发线程配置
 VERSION_CHECK_THREADS = 10
 PACKAGE_DOWNLOAD_THREADS = 2
 
+# 下载带宽限制（字节/秒），所有下载线程共享，0 表示不限速
+DOWNLOAD_BANDWIDTH_LIMIT = 0
+
+# 分时段带宽限制 [("开始时间", "结束时间", 字节/秒), ...]，命中时段时覆盖 DOWNLOAD_BANDWIDTH_LIMIT
+# 例如白天限速 2MB/s、夜间全速：[("08:00", "22:00", 2 * 1024 * 1024)]
+DOWNLOAD_BANDWIDTH_SCHEDULE = []
+
+# 包目录保留最近多少天发布的文件（按 run_id 清理，同时从简单索引和变更流中移除），0 表示全部保留
+# 每日归档在当天完成，因此清理不会影响归档内容
+STORE_RETENTION_DAYS = 0
+
+# 完整性校验进程数，0 表示使用全部 CPU 核心
+VERIFY_PROCESSES = 0
+
+# 下载失败重试：失败的文件进入持久化重试队列，按指数退避（含随机抖动）重试
+RETRY_BASE_DELAY_SECONDS = 30
+RETRY_MAX_DELAY_SECONDS = 6 * 3600
+RETRY_MAX_ATTEMPTS = 8
+
+# 主下载完成后，最多等待多久让退避中的文件到期并重试（秒），其余留待下次运行
+RETRY_PASS_MAX_WAIT_SECONDS = 300
+
 # 若无法识别平台，是否仍允许下载
 ALLOW_UNKNOWN_PLATFORM_DOWNLOAD = True
 
+# PyPI JSON API 上游列表，按优先级排列，{name} 为包名
+# 例如内部 devpi：["http://devpi.local/root/pypi/{name}/json", "https://pypi.org/pypi/{name}/json"]
+PYPI_INDEX_URLS = ["https://pypi.org/pypi/{name}/json"]
+
+# 文件下载镜像前缀，按优先级排列，替换原始地址中的 https://files.pythonhosted.org/
+# 例如 bandersnatch 镜像：["http://mirror.local/", "https://files.pythonhosted.org/"]
+FILE_MIRROR_URLS = ["https://files.pythonhosted.org/"]
+
+# 对冲请求：请求超过当前上游延迟的该百分位仍未返回时，向下一个上游发起重复请求
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_DELAY_SECONDS = 0.2
+HEDGE_DEFAULT_DELAY_SECONDS = 2  # 延迟样本不足时使用
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MAX_WORKERS = 32
+
 # 开关SSL验证
 VERIFY_SSL = False
 
 # windows计划任务每天运行时间
 START_TIME = "03:00"
 
+# 常驻模式：两次检查/下载之间的间隔（秒）
+DAEMON_INTERVAL_SECONDS = 3600
+
+# 常驻模式：本地控制端口（仅监听 127.0.0.1），0 表示不开启
+# POST /run 立即强制检查全部包（POST /run?packages=a,b 只强制检查指定的包），GET /status 查看运行状态
+DAEMON_CONTROL_PORT = 8765
+
+# 常驻模式：每隔多少轮将增量日志合并回 packages.json
+DAEMON_COMPACT_CYCLES = 24
+
 def check_config():
     if DOWNLOAD_MODE not in ["whitelist","blacklist"]:
         print(f"错误的下载策略:{DOWNLOAD_MODE} 应为 whitelist blacklist 之一")
@@ -39,3 +103,52 @@ def check_config():
             print(f"无效平台{platform} 应为 windows mac linux 之一")
             sys.exit()
 
+    if DAEMON_INTERVAL_SECONDS <= 0 or DAEMON_COMPACT_CYCLES <= 0:
+        print(f"错误的常驻模式配置: 间隔 {DAEMON_INTERVAL_SECONDS} 秒，合并周期 {DAEMON_COMPACT_CYCLES} 轮，应为正整数")
+        sys.exit()
+
+    if not 0 < CHECK_INTERVAL_MIN_HOURS <= CHECK_INTERVAL_MAX_HOURS or CHECK_INTERVAL_FACTOR <= 0:
+        print(f"错误的自适应检查配置: 间隔 {CHECK_INTERVAL_MIN_HOURS}-{CHECK_INTERVAL_MAX_HOURS} 小时，系数 {CHECK_INTERVAL_FACTOR}")
+        sys.exit()
+
+    if CIRCUIT_FAILURE_THRESHOLD < 1 or not 0 < CIRCUIT_BASE_OPEN_HOURS <= CIRCUIT_MAX_OPEN_HOURS:
+        print(f"错误的熔断配置: 阈值 {CIRCUIT_FAILURE_THRESHOLD}，熔断 {CIRCUIT_BASE_OPEN_HOURS}-{CIRCUIT_MAX_OPEN_HOURS} 小时")
+        sys.exit()
+
+    if RETRY_MAX_ATTEMPTS < 1 or RETRY_BASE_DELAY_SECONDS < 0 or RETRY_MAX_DELAY_SECONDS < RETRY_BASE_DELAY_SECONDS:
+        print(f"错误的重试配置: 次数 {RETRY_MAX_ATTEMPTS}，延迟 {RETRY_BASE_DELAY_SECONDS}-{RETRY_MAX_DELAY_SECONDS} 秒")
+        sys.exit()
+
+    if not PYPI_INDEX_URLS or any("{name}" not in url for url in PYPI_INDEX_URLS):
+        print(f"错误的上游配置:{PYPI_INDEX_URLS} 应为非空列表，且每个地址包含 {{name}}")
+        sys.exit()
+
+    if not FILE_MIRROR_URLS or any(not url.endswith("/") for url in FILE_MIRROR_URLS):
+        print(f"错误的文件镜像配置:{FILE_MIRROR_URLS} 应为非空列表，且每个前缀以 / 结尾")
+        sys.exit()
+
+    if not 0 < HEDGE_PERCENTILE <= 100:
+        print(f"错误的对冲百分位:{HEDGE_PERCENTILE} 应在 0 到 100 之间")
+        sys.exit()
+
+    if STORE_RETENTION_DAYS < 0:
+        print(f"错误的包目录保留天数:{STORE_RETENTION_DAYS} 应为非负整数")
+        sys.exit()
+
+    if DOWNLOAD_BANDWIDTH_LIMIT < 0:
+        print(f"错误的带宽限制:{DOWNLOAD_BANDWIDTH_LIMIT} 应为非负整数")
+        sys.exit()
+
+    for item in DOWNLOAD_BANDWIDTH_SCHEDULE:
+        try:
+            start, end, rate = item
+            for t in (start, end):
+                hour, minute = (int(x) for x in t.split(":"))
+                if not (0 <= hour < 24 and 0 <= minute < 60):
+                    raise ValueError
+            if int(rate) < 0:
+                raise ValueError
+        except (TypeError, ValueError, AttributeError):
+            print(f"错误的分时段带宽限制:{item} 应为 (\"HH:MM\", \"HH:MM\", 字节/秒)")
+            sys.exit()
+
@@ -0,0 +1,100 @@
+import statistics
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Iterable
+from utils.logger import log
+from core.package_health import circuit_state
+from config import (
+    ADAPTIVE_CHECK_INTERVAL,
+    CHECK_INTERVAL_MIN_HOURS,
+    CHECK_INTERVAL_MAX_HOURS,
+    CHECK_INTERVAL_FACTOR,
+    FORCE_CHECK_PACKAGES,
+)
+
+RECENT_RELEASES = 10  # 只根据最近若干个版本估计发布节奏
+
+
+def _parse_time(value: str) -> Optional[datetime]:
+    """解析 PyPI 的 upload_time，统一为 UTC 时间"""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def estimate_check_interval(releases: Dict[str, list], now: Optional[datetime] = None) -> int:
+    """
+    根据 PyPI 返回的 releases 中的 upload_time 估计发布节奏，返回下次检查的间隔（秒）
+    - 取最近若干个版本的发布间隔中位数作为发布周期
+    - 距上次发布的时间超过发布周期时，以距上次发布的时间为准（长期不发布的包逐渐降低检查频率）
+    - 只有一个版本时以距该版本发布的时间作为发布周期（新项目刚发布时频繁检查）
+    - 检查间隔 = 发布周期 * CHECK_INTERVAL_FACTOR，并限制在最小/最大间隔之间
+    """
+    min_interval = int(CHECK_INTERVAL_MIN_HOURS * 3600)
+    max_interval = int(CHECK_INTERVAL_MAX_HOURS * 3600)
+    now = now or datetime.now(timezone.utc)
+
+    release_times = []
+    for files in releases.values():
+        times = [_parse_time(f.get("upload_time_iso_8601") or f.get("upload_time")) for f in files]
+        times = [t for t in times if t]
+        if times:
+            release_times.append(min(times))  # 以版本的首个文件上传时间作为发布时间
+    release_times.sort()
+    release_times = release_times[-RECENT_RELEASES:]
+
+    if not release_times:
+        return max_interval
+
+    since_last = (now - release_times[-1]).total_seconds()
+    if len(release_times) < 2:
+        cadence = since_last
+    else:
+        gaps = [(b - a).total_seconds() for a, b in zip(release_times, release_times[1:])]
+        cadence = max(statistics.median(gaps), since_last)
+
+    return int(min(max(cadence * CHECK_INTERVAL_FACTOR, min_interval), max_interval))
+
+
+def is_due(info: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+    """根据 last_checked 和 check_interval 判断包是否到期需要检查"""
+    last_checked = info.get("last_checked")
+    check_interval = info.get("check_interval")
+    if not last_checked or not check_interval:
+        return True
+    try:
+        last_checked = datetime.fromisoformat(last_checked)
+    except ValueError:
+        return True
+    now = now or datetime.now()
+    return (now - last_checked).total_seconds() >= check_interval
+
+
+def select_due_packages(packages_data: Dict[str, Any], force_packages: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    筛选本次需要检查的包：到期且未熔断的包 + 强制检查的包
+    关闭自适应检查时只跳过熔断中的包
+    """
+    all_packages = list(packages_data.keys())
+    forced = set(FORCE_CHECK_PACKAGES) | set(force_packages or [])
+    now = datetime.now()
+
+    due = []
+    open_count = 0
+    for name in all_packages:
+        info = packages_data[name]
+        if name in forced:
+            due.append(name)
+        elif circuit_state(info, now) == "open":
+            open_count += 1
+        elif not ADAPTIVE_CHECK_INTERVAL or is_due(info, now):
+            due.append(name)
+
+    skipped = len(all_packages) - len(due)
+    log.info(f"本次检查 {len(due)} 个包（其中强制检查 {len(forced & set(all_packages))} 个），"
+             f"跳过 {skipped - open_count} 个未到期的包和 {open_count} 个熔断中的包，相比全量检查节省 {skipped} 次请求"
+             f"（{skipped / len(all_packages) * 100 if all_packages else 0:.1f}%）")
+    return due
@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import signal
+import threading
+import requests
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Iterable
+from urllib.parse import urlsplit, parse_qs
+from utils.logger import log
+from utils.archive_generator import ArchiveGenerator
+from utils.remove_empty_folders import remove_empty_folders_touched
+from utils.init_packages import DEFAULT_PACKAGE_TEMPLATE
+from core.version_checker import MetadataCache
+from core.package_manager import check_packages, load_from_file, save_to_file
+from core.packages_downloader import PackagesDownloader, publish_downloaded_files
+from core.retry_queue import RetryQueue
+from config import (
+    DAEMON_INTERVAL_SECONDS,
+    DAEMON_CONTROL_PORT,
+    DAEMON_COMPACT_CYCLES,
+    VERSION_CHECK_THREADS,
+    PACKAGE_DOWNLOAD_THREADS,
+)
+
+INIT_PACKAGES_PATH = "init_packages.json"
+PACKAGES_JSON_PATH = "data/packages.json"
+JOURNAL_PATH = "data/packages.journal"
+DOWNLOAD_BASE_DIR = "data/packages"
+
+
+def _entry_key(entry: Dict[str, Any]) -> str:
+    """用于判断包数据是否变化，忽略每次检查都会变化的 last_checked（只有它变化时写入紧凑的日志记录）"""
+    return json.dumps({k: v for k, v in entry.items() if k != "last_checked"}, sort_keys=True)
+
+
+class UpdaterDaemon:
+    """
+    常驻模式：
+    - 包数据、HTTP 连接池、元数据缓存常驻内存
+    - 按固定间隔执行检查和下载（只检查到期的包），可通过本地控制端口或 SIGUSR1 立即触发
+      手动触发时强制检查全部包，或只强制检查指定的包
+    - 每轮开始时重新读取 init_packages.json，加入新增的包
+    - 每轮只将变化的包追加到增量日志（只有 last_checked 变化时只记录该字段），定期合并回 packages.json
+    - 跨天时归档前一天发布的文件
+    """
+
+    def __init__(self, interval: int = DAEMON_INTERVAL_SECONDS, control_port: int = DAEMON_CONTROL_PORT,
+                 compact_cycles: int = DAEMON_COMPACT_CYCLES):
+        self.interval = interval
+        self.control_port = control_port
+        self.compact_cycles = compact_cycles
+
+        self.wakeup = threading.Event()
+        self.force_lock = threading.Lock()
+        self.force_all = False  # 下一轮强制检查全部包
+        self.force_packages = set()  # 下一轮强制检查的包
+        self.stopping = threading.Event()
+        self.server = None
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(VERSION_CHECK_THREADS, PACKAGE_DOWNLOAD_THREADS))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.metadata_cache = MetadataCache()
+        self.retry_queue = RetryQueue()
+        self.retry_queue.load()
+
+        self.packages_data = self.load_state()
+        self.store_date = datetime.now().strftime("%Y-%m-%d")
+        self.cycles = 0
+        self.last_cycle_at = None
+        self.last_cycle_seconds = None
+        self.running = False
+
+    # --------------------------
+    # 状态持久化
+    # --------------------------
+    def load_state(self) -> Dict[str, Any]:
+        """加载 packages.json 并回放上次未合并的增量日志"""
+        packages_data = load_from_file(PACKAGES_JSON_PATH)
+        replayed = 0
+        if os.path.isfile(JOURNAL_PATH):
+            with open(JOURNAL_PATH, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        log.warning("增量日志末尾存在不完整的记录，已忽略")
+                        break
+                    if "entry" in record:
+                        packages_data[record["name"]] = record["entry"]
+                    elif record["name"] in packages_data:
+                        packages_data[record["name"]]["last_checked"] = record["last_checked"]
+                    replayed += 1
+        if replayed:
+            log.info(f"回放增量日志 {replayed} 条")
+            self.compact(packages_data)
+        return packages_data
+
+    def append_journal(self, names: List[str], checked: Iterable[str] = ()):
+        """
+        将变化的包追加到增量日志
+        names 中的包记录完整数据，checked 中的包只有 last_checked 变化，只记录该字段
+        """
+        checked = list(checked)
+        if not names and not checked:
+            return
+        with open(JOURNAL_PATH, "a", encoding="utf-8") as f:
+            for name in names:
+                f.write(json.dumps({"name": name, "entry": self.packages_data[name]}, ensure_ascii=False) + "\n")
+            for name in checked:
+                f.write(json.dumps({"name": name, "last_checked": self.packages_data[name]["last_checked"]},
+                                   ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        log.info(f"增量保存 {len(names)} 个包的状态，{len(checked)} 个包的检查时间")
+
+    def compact(self, packages_data: Dict[str, Any] = None):
+        """将完整状态写回 packages.json 并清空增量日志"""
+        save_to_file(packages_data if packages_data is not None else self.packages_data, PACKAGES_JSON_PATH)
+        if os.path.exists(JOURNAL_PATH):
+            os.remove(JOURNAL_PATH)
+
+    # --------------------------
+    # 检查与下载
+    # --------------------------
+    def add_new_packages(self) -> List[str]:
+        """重新读取 init_packages.json，将新增的包加入内存中的包数据，返回新增的包名"""
+        try:
+            with open(INIT_PACKAGES_PATH, "r", encoding="utf-8") as f:
+                init_names = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning(f"读取 {INIT_PACKAGES_PATH} 失败，本轮不加入新包: {e}")
+            return []
+        added = [name for name in init_names if name not in self.packages_data]
+        for name in added:
+            self.packages_data[name] = DEFAULT_PACKAGE_TEMPLATE.copy()
+        if added:
+            log.info(f"从 {INIT_PACKAGES_PATH} 加入 {len(added)} 个新包")
+        return added
+
+    def finalize_day(self, date_str: str):
+        """归档指定日期发布的文件"""
+        log.info(f"日期变更，归档 {date_str} 发布的文件")
+        remove_empty_folders_touched(DOWNLOAD_BASE_DIR)
+        ArchiveGenerator().create_daily_archive(date_str)
+
+    def run_cycle(self):
+        """执行一轮检查和下载"""
+        self.running = True
+        start_time = time.time()
+        try:
+            today = datetime.now().strftime("%Y-%m-%d")
+            if today != self.store_date:
+                self.finalize_day(self.store_date)
+                self.store_date = today
+
+            before = {name: (_entry_key(entry), entry.get("last_checked"))
+                      for name, entry in self.packages_data.items()}
+            self.add_new_packages()
+
+            with self.force_lock:
+                force_packages = list(self.packages_data) if self.force_all else sorted(self.force_packages)
+                self.force_all = False
+                self.force_packages = set()
+
+            self.packages_data = check_packages(self.packages_data, self.session, self.metadata_cache,
+                                                force_packages=force_packages)
+
+            downloader = PackagesDownloader(PACKAGES_JSON_PATH, DOWNLOAD_BASE_DIR, self.session)
+            downloader.packages_data = self.packages_data
+            downloader.retry_queue = self.retry_queue
+            # 退避中的文件留给后续轮次，不阻塞本轮
+            downloader.download_outdated_packages(save=False, retry_wait=0)
+            publish_downloaded_files(downloader.downloaded_files)
+            downloader.manifest.close()
+
+            changed, checked = [], []
+            for name, entry in self.packages_data.items():
+                key, last_checked = before.get(name, (None, None))
+                if key != _entry_key(entry):
+                    changed.append(name)
+                elif last_checked != entry.get("last_checked"):
+                    checked.append(name)
+            self.append_journal(changed, checked)
+
+            self.cycles += 1
+            if self.cycles % self.compact_cycles == 0:
+                self.compact()
+        except Exception as e:
+            log.error(f"本轮检查失败: {e}")
+        finally:
+            self.running = False
+            self.last_cycle_at = datetime.now().isoformat()
+            self.last_cycle_seconds = time.time() - start_time
+            log.info(f"本轮检查结束，耗时: {self.last_cycle_seconds:.2f}秒，下一轮将在 {self.interval} 秒后开始")
+
+    # --------------------------
+    # 控制接口
+    # --------------------------
+    def trigger(self, packages: Optional[Iterable[str]] = None):
+        """
+        立即触发一轮检查，无论是否到期
+        packages 为 None 时强制检查全部包，否则只强制检查这些包（其余包仍按是否到期检查）
+        """
+        with self.force_lock:
+            if packages is None:
+                self.force_all = True
+            else:
+                self.force_packages.update(packages)
+        self.wakeup.set()
+
+    def stop(self):
+        """请求退出"""
+        self.stopping.set()
+        self.wakeup.set()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "cycles": self.cycles,
+            "last_cycle_at": self.last_cycle_at,
+            "last_cycle_seconds": self.last_cycle_seconds,
+            "packages": len(self.packages_data),
+            "interval": self.interval,
+        }
+
+    def start_control_server(self):
+        """在 127.0.0.1 上启动控制接口"""
+        daemon = self
+
+        class ControlHandler(BaseHTTPRequestHandler):
+            def _reply(self, code: int, body: Dict[str, Any]):
+                content = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                if self.path == "/status":
+                    self._reply(200, daemon.status())
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                # POST /run 强制检查全部包，POST /run?packages=a,b 只强制检查指定的包
+                url = urlsplit(self.path)
+                if url.path == "/run":
+                    values = parse_qs(url.query).get("packages")
+                    packages = [name for value in values for name in value.split(",") if name] if values else None
+                    daemon.trigger(packages)
+                    self._reply(202, {"triggered": True, "force_packages": packages if packages is not None else "all"})
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def log_message(self, format, *args):
+                log.debug(f"控制接口: {format % args}")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.control_port), ControlHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        log.info(f"控制接口已启动: http://127.0.0.1:{self.control_port} (POST /run[?packages=a,b], GET /status)")
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGINT, lambda signum, frame: self.stop())
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        if hasattr(signal, "SIGUSR1"):  # Windows 下没有 SIGUSR1，使用控制接口触发
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.trigger())
+
+    def serve_forever(self):
+        """主循环：立即执行一轮，之后按间隔或被触发时执行"""
+        self.install_signal_handlers()
+        if self.control_port:
+            self.start_control_server()
+
+        log.info(f"常驻模式启动，检查间隔 {self.interval} 秒")
+        try:
+            while not self.stopping.is_set():
+                self.wakeup.clear()
+                self.run_cycle()
+                self.wakeup.wait(self.interval)
+        finally:
+            if self.server:
+                self.server.shutdown()
+            self.compact()
+            log.info("常驻模式已退出，状态已保存")
+
+
+def main():
+    UpdaterDaemon().serve_forever()
@@ -0,0 +1,158 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from utils.logger import log
+from config import (
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_DELAY_SECONDS,
+    HEDGE_DEFAULT_DELAY_SECONDS,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_MAX_WORKERS,
+)
+
+LATENCY_WINDOW = 200  # 每个上游保留的最近延迟样本数
+
+
+def upstream_of(url: str) -> str:
+    """以 scheme://host 作为上游标识"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class LatencyTracker:
+    """记录各上游最近的响应延迟，用于计算对冲请求的触发时间"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples: Dict[str, deque] = {}
+
+    def record(self, upstream: str, seconds: float):
+        with self.lock:
+            self.samples.setdefault(upstream, deque(maxlen=self.window)).append(seconds)
+
+    def hedge_delay(self, upstream: str) -> float:
+        """
+        返回该上游延迟的 HEDGE_PERCENTILE 分位数
+        样本不足时使用 HEDGE_DEFAULT_DELAY_SECONDS
+        """
+        with self.lock:
+            samples = sorted(self.samples.get(upstream, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY_SECONDS
+        index = min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE / 100))
+        return max(HEDGE_MIN_DELAY_SECONDS, samples[index])
+
+
+latency_tracker = LatencyTracker()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="Hedge")
+        return _executor
+
+
+def _close_response(future):
+    """关闭落败请求的响应，释放连接"""
+    try:
+        future.result().close()
+    except Exception:
+        pass
+
+
+def _timed_get(http, url: str, headers: Optional[dict], **kwargs):
+    """发起请求并记录延迟（流式请求记录的是首字节延迟）"""
+    start = time.monotonic()
+    try:
+        return http.get(url, headers=headers, **kwargs)
+    finally:
+        latency_tracker.record(upstream_of(url), time.monotonic() - start)
+
+
+def hedged_get(http, candidates: List[Tuple[str, Optional[dict]]], accept: Callable, **kwargs) -> Tuple[int, object]:
+    """
+    按优先级向多个上游请求同一资源：
+    - 先请求第一个上游，超过其延迟分位数仍未返回时，向下一个上游发起对冲请求
+    - 某个上游失败或返回不可接受的响应时，立即转向下一个上游
+    - 第一个被 accept 接受的响应获胜，其余请求的响应被关闭
+
+    Args:
+        http: requests 模块或 requests.Session
+        candidates: [(url, headers), ...]，按优先级排列
+        accept: 判断响应是否可用的函数
+        kwargs: 传给 http.get 的其他参数
+
+    Returns:
+        (获胜的候选序号, 响应)
+
+    Raises:
+        全部失败时抛出优先级最高的上游的异常（不可接受的响应会通过 raise_for_status 转为 HTTPError）
+    """
+    if len(candidates) == 1:
+        url, headers = candidates[0]
+        response = _timed_get(http, url, headers, **kwargs)
+        if not accept(response):
+            response.raise_for_status()
+        return 0, response
+
+    executor = _get_executor()
+    pending = {}
+    errors = {}
+    next_index = 0
+
+    def launch():
+        nonlocal next_index
+        url, headers = candidates[next_index]
+        if next_index > 0:
+            log.debug(f"向备用上游发起请求: {url}")
+        pending[executor.submit(_timed_get, http, url, headers, **kwargs)] = next_index
+        next_index += 1
+
+    launch()
+    while pending:
+        timeout = None
+        if next_index < len(candidates):
+            timeout = latency_tracker.hedge_delay(upstream_of(candidates[next_index - 1][0]))
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        if not done:
+            # 超过延迟分位数仍未返回，发起对冲请求
+            launch()
+            continue
+
+        for future in done:
+            index = pending.pop(future)
+            try:
+                response = future.result()
+            except Exception as e:
+                errors[index] = e
+                continue
+
+            if accept(response):
+                for other in pending:
+                    other.add_done_callback(_close_response)
+                if index > 0:
+                    log.debug(f"备用上游获胜: {candidates[index][0]}")
+                return index, response
+
+            try:
+                response.raise_for_status()
+                raise ValueError(f"不可接受的响应: HTTP {response.status_code}")
+            except Exception as e:
+                errors[index] = e
+            finally:
+                response.close()
+
+        if not pending and next_index < len(candidates):
+            # 已发出的请求全部失败，立即转向下一个上游
+            launch()
+
+    raise errors[min(errors)]
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from utils.logger import log
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_BASE_OPEN_HOURS, CIRCUIT_MAX_OPEN_HOURS
+
+"""
+包健康状态，保存在每个包的 "health" 字段：
+{
+    "consecutive_failures": 4,              连续失败次数
+    "last_error": "ignore",                 最近一次错误（ignore 表示 404 等不可重试错误）
+    "last_failure": "2025-10-01T03:00:00",
+    "circuit_open_until": "2025-10-03T03:00:00"   熔断截止时间，None 表示未熔断
+}
+
+熔断器状态：
+- closed: 正常检查
+- open: 熔断中，跳过检查
+- half_open: 熔断到期，下次检查作为探测（只请求一次），成功则恢复，失败则以更长的时间重新熔断
+"""
+
+
+def circuit_state(info: Dict[str, Any], now: Optional[datetime] = None) -> str:
+    """返回包的熔断器状态 closed / open / half_open"""
+    open_until = (info.get("health") or {}).get("circuit_open_until")
+    if not open_until:
+        return "closed"
+    now = now or datetime.now()
+    return "open" if now < datetime.fromisoformat(open_until) else "half_open"
+
+
+def record_success(package_name: str, info: Dict[str, Any]):
+    """检查成功，重置健康状态"""
+    health = info.get("health")
+    if health and health.get("circuit_open_until"):
+        log.info(f"{package_name} 探测成功，熔断解除")
+    info["health"] = None
+
+
+def record_failure(package_name: str, info: Dict[str, Any], error: str):
+    """
+    检查失败，累计连续失败次数
+    连续失败达到阈值后熔断，熔断时长随失败次数翻倍，直到上限
+    """
+    now = datetime.now()
+    health = dict(info.get("health") or {})
+    failures = health.get("consecutive_failures", 0) + 1
+    health.update({
+        "consecutive_failures": failures,
+        "last_error": error,
+        "last_failure": now.isoformat(),
+        "circuit_open_until": None,
+    })
+
+    if failures >= CIRCUIT_FAILURE_THRESHOLD:
+        hours = min(CIRCUIT_MAX_OPEN_HOURS, CIRCUIT_BASE_OPEN_HOURS * 2 ** (failures - CIRCUIT_FAILURE_THRESHOLD))
+        health["circuit_open_until"] = (now + timedelta(hours=hours)).isoformat()
+        log.warning(f"{package_name} 连续失败 {failures} 次（{error}），熔断 {hours} 小时")
+
+    info["health"] = health
+
+
+def open_circuits(packages_data: Dict[str, Any]) -> List[str]:
+    """返回当前处于熔断中的包"""
+    now = datetime.now()
+    return [name for name, info in packages_data.items() if circuit_state(info, now) == "open"]
+
+
+def log_open_circuits(packages_data: Dict[str, Any]):
+    """在运行摘要中列出熔断中的包"""
+    names = open_circuits(packages_data)
+    if not names:
+        log.info("熔断中的包: 无")
+        return
+    log.info(f"熔断中的包: {len(names)} 个")
+    for name in sorted(names):
+        health = packages_data[name]["health"]
+        log.info(f"  {name}: 连续失败 {health['consecutive_failures']} 次，最近错误 {health['last_error']}，"
+                 f"熔断至 {health['circuit_open_until']}")
@@ -6,7 +6,8 @@ from utils.init_packages import initialize_packages
 from utils.logger import log
 from core.version_checker import VersionChecker
 from core.version_updater import VersionUpdater
-from core.packages_downloader import main as packages_downloader
+from core.check_scheduler import select_due_packages
+from core.package_health import circuit_state, log_open_circuits
 from config import VERSION_CHECK_THREADS
 
 NUM_WORKERS = VERSION_CHECK_THREADS
@@ -34,7 +35,8 @@ class PackageManager:
             return self.packages_data.copy()  # 返回拷贝避免外部修改
         
         
-def worker_thread(worker_id: int, package_manager: PackageManager, packages_to_process: list):
+def worker_thread(worker_id: int, package_manager: PackageManager, packages_to_process: list,
+                  session=None, metadata_cache=None):
     """
     工作线程函数 - 处理分配的包
     """
@@ -43,7 +45,12 @@ def worker_thread(worker_id: int, package_manager: PackageManager, packages_to_p
     log.info(f"{thread_name} 开始处理 {len(packages_to_process)} 个包")
     
     for package_name in packages_to_process:
-        version_checker = VersionChecker(package_name, thread_name)
+        # 熔断到期的包只探测一次，避免重试和退避等待
+        probing = circuit_state(package_manager.packages_data[package_name]) == "half_open"
+        if probing:
+            log.info(f"线程 {thread_name} 探测熔断到期的包 {package_name}")
+        version_checker = VersionChecker(package_name, thread_name, session, metadata_cache,
+                                         max_retries=1 if probing else 3)
         pypi_info, status = version_checker.get_package_info_from_pypi()
 
         version_updater = VersionUpdater(pypi_info, package_manager, package_name, status)
@@ -84,18 +91,22 @@ def save_to_file(data: Dict[str, Any], filepath: str = "data/packages.json"):
         log.error(f"保存文件失败: {e}")
 
 
-def run_package_workflow():
-    """主函数 入口 - 协调多线程处理和单线程文件操作"""
-    
-    # 单线程：从文件加载数据
-    packages_data = load_from_file()
-    log.info(f"从文件加载了 {len(packages_data)} 个包的数据")
-    
+def check_packages(packages_data: Dict[str, Any], session=None, metadata_cache=None,
+                   force_packages: Optional[list] = None) -> Dict[str, Any]:
+    """
+    多线程检查 packages_data 中到期包的最新版本，返回更新后的数据
+
+    Args:
+        packages_data: 包数据
+        session: 共享的 requests.Session（常驻进程复用连接池），None 表示每次新建连接
+        metadata_cache: 共享的 MetadataCache（常驻进程使用条件请求），None 表示不缓存
+        force_packages: 无论是否到期都强制检查的包
+    """
     # 创建包管理器（管理内存中的数据）
     package_manager = PackageManager(packages_data)
     
-    # 分配工作给线程
-    all_packages = list(packages_data.keys())
+    # 分配工作给线程（只分配到期的包）
+    all_packages = select_due_packages(packages_data, force_packages)
     num_workers = NUM_WORKERS
     packages_per_worker = len(all_packages) // num_workers
     
@@ -120,7 +131,7 @@ def run_package_workflow():
         if workload:  # 只创建有工作的线程
             thread = threading.Thread(
                 target=worker_thread,
-                args=(i + 1, package_manager, workload)
+                args=(i + 1, package_manager, workload, session, metadata_cache)
             )
             threads.append(thread)
             thread.start()
@@ -133,12 +144,32 @@ def run_package_workflow():
     end_time = time.time()
     log.info(f"多线程处理完成，耗时: {end_time - start_time:.2f}秒")
     
-    # 单线程：获取最终数据并保存到文件
+    # 单线程：获取最终数据
     final_data = package_manager.get_packages_data()
+    log_open_circuits(final_data)
+    return final_data
+
+
+def run_check_workflow(force_packages: Optional[list] = None):
+    """检查阶段入口 - 检查到期包的最新版本并保存到文件"""
+    
+    # 单线程：从文件加载数据
+    packages_data = load_from_file()
+    log.info(f"从文件加载了 {len(packages_data)} 个包的数据")
+    
+    # 多线程：检查所有包的最新版本
+    final_data = check_packages(packages_data, force_packages=force_packages)
     
     # 单线程：保存到文件
     save_to_file(final_data)
+
+
+def run_package_workflow(force_packages: Optional[list] = None):
+    """主函数 入口 - 协调多线程处理和单线程文件操作"""
+    # 下载模块依赖 tqdm 等，只在需要下载时导入
+    from core.packages_downloader import main as packages_downloader
+
+    run_check_workflow(force_packages)
     
-    # 下载过期的包
+    # 下载过期的包，并增量更新简单索引和变更流
     packages_downloader()
-
@@ -3,28 +3,57 @@ import json
 import requests
 import threading
 import time
-import shutil
-import hashlib
+import queue
 from tqdm import tqdm
+from datetime import datetime, timedelta
 from typing import Dict
 from utils.logger import log
-from config import PACKAGE_DOWNLOAD_THREADS
+from utils.bandwidth_limiter import BandwidthLimiter
+from utils.simple_index import SimpleIndexGenerator
+from utils.changefeed import Changefeed
+from utils.store_manifest import StoreManifest
+from utils.file_hash import calc_sha256
+from core.retry_queue import RetryQueue
+from core.hedged_request import hedged_get
+from config import (
+    FILE_MIRROR_URLS,
+    PACKAGE_DOWNLOAD_THREADS,
+    DOWNLOAD_BANDWIDTH_LIMIT,
+    DOWNLOAD_BANDWIDTH_SCHEDULE,
+    RETRY_PASS_MAX_WAIT_SECONDS,
+    STORE_RETENTION_DAYS,
+)
 
 PACKAGES_JSON_PATH = "data/packages.json"
 DOWNLOAD_BASE_DIR = "data/packages"
 NUM_WORKERS = PACKAGE_DOWNLOAD_THREADS  # 下载线程数量
+FILES_HOST = "https://files.pythonhosted.org/"  # PyPI 元数据中文件地址的前缀
+
+
+def mirror_urls(url: str) -> list:
+    """按 FILE_MIRROR_URLS 的优先级生成文件的候选下载地址"""
+    if not url.startswith(FILES_HOST):
+        return [url]
+    urls = [prefix + url[len(FILES_HOST):] for prefix in FILE_MIRROR_URLS]
+    return urls or [url]
 
 class PackagesDownloader:
     """
     从 packages.json 读取包信息，并多线程下载过期包
     """
 
-    def __init__(self, json_path: str = PACKAGES_JSON_PATH, download_dir: str = DOWNLOAD_BASE_DIR):
+    def __init__(self, json_path: str = PACKAGES_JSON_PATH, download_dir: str = DOWNLOAD_BASE_DIR, session=None):
         self.progress = None    
+        self.http = session or requests  # 常驻进程传入共享的 Session 以复用连接
         self.json_path = json_path
         self.download_dir = download_dir
         self.lock = threading.Lock()  # 保护内存 packages_data
         self.packages_data: Dict[str, dict] = {}  # 内存中的包数据
+        self.limiter = BandwidthLimiter(DOWNLOAD_BANDWIDTH_LIMIT, DOWNLOAD_BANDWIDTH_SCHEDULE)  # 所有线程共享的限速器
+        self.downloaded_files = []  # 本次运行成功下载的文件记录
+        self.retry_queue = RetryQueue(os.path.join(os.path.dirname(json_path), "retry_queue.json"))  # 失败文件的重试队列
+        self.abandoned_packages = set()  # 有文件超过最大重试次数的包
+        self.manifest = StoreManifest(download_dir)  # 包目录清单，写入或删除文件时同步更新
 
     def load_packages(self):
         """从 JSON 文件加载包数据"""
@@ -35,6 +64,7 @@ class PackagesDownloader:
         except FileNotFoundError:
             log.error(f"{self.json_path} 不存在")
             self.packages_data = {}
+        self.retry_queue.load()
 
     def save_packages(self):
         """将内存中的包数据保存回 JSON 文件"""
@@ -48,8 +78,8 @@ class PackagesDownloader:
 
     def download_package(self, thread_name: str, package_name: str, version: str, filename: str, url: str, sha256: str) -> bool:
         """
-        下载单个包到指定目录，并在内存中更新 status
-        增加哈希验证与失败重试机制
+        下载单个包到指定目录，并验证哈希
+        失败时不在线程内立即重试，而是加入重试队列，按退避时间在主下载完成后或下次运行时重试
 
         Args:
             worker_id: 线程ID
@@ -63,123 +93,209 @@ class PackagesDownloader:
         os.makedirs(target_dir, exist_ok=True)
         file_path = os.path.join(target_dir, filename)
 
-        def calc_sha256(path: str) -> str:
-            """计算文件的SHA256"""
-            h = hashlib.sha256()
-            with open(path, "rb") as f:
-                for chunk in iter(lambda: f.read(8192), b""):
-                    h.update(chunk)
-            return h.hexdigest()
-
-        MAX_RETRY = 3
-        for attempt in range(1, MAX_RETRY + 1):
-            try:
-                log.debug(f"线程 {thread_name} 第({attempt}/{MAX_RETRY})次尝试下载 {filename}")
-                response = requests.get(url, stream=True, timeout=15)
+        try:
+            log.debug(f"线程 {thread_name} 开始下载 {filename}")
+            # 多个镜像时，首字节超时的请求会向下一个镜像对冲，完整性由 sha256 保证
+            candidates = [(mirror_url, None) for mirror_url in mirror_urls(url)]
+            while True:
+                index, response = hedged_get(self.http, candidates, accept=lambda r: r.status_code == 200,
+                                             stream=True, timeout=15)
                 response.raise_for_status()
 
                 with open(file_path, 'wb') as f:
                     for chunk in response.iter_content(chunk_size=8192):
                         if chunk:
+                            self.limiter.consume(len(chunk))
                             f.write(chunk)
 
-                # 验证哈希
+                # 验证哈希，不匹配时排除该镜像，改用其余镜像
                 if sha256:
                     file_hash = calc_sha256(file_path)
                     if file_hash.lower() != sha256.lower():
+                        bad_url = candidates.pop(index)[0]
+                        if candidates:
+                            log.warning(f"线程 {thread_name} {bad_url} 哈希不匹配，改用其他镜像")
+                            continue
                         raise ValueError(f"哈希不匹配 (expected {sha256}, got {file_hash})")
+                break
+
+            log.debug(f"线程 {thread_name} 成功下载并验证 {filename}")
+            self.retry_queue.remove(package_name, version, filename)
+            self.manifest.add(package_name, version, filename, sha256)
+
+            # 记录下载结果并更新进度条
+            with self.lock:
+                self.downloaded_files.append({
+                    "package": package_name,
+                    "version": version,
+                    "filename": filename,
+                    "sha256": sha256,
+                    "size": os.path.getsize(file_path),
+                })
+                if self.progress:
+                    self.progress.update(1)
 
-                log.debug(f"线程 {thread_name} 成功下载并验证 {filename}")
+            return True
 
-                # 更新进度条
+        except Exception as e:
+            log.warning(f"线程 {thread_name} 下载 {filename} 失败: {e}")
+            if os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    log.warning(f"无法删除损坏文件 {file_path}")
+            self.manifest.remove(package_name, version, filename)
+
+            if not self.retry_queue.add(package_name, version, filename, url, sha256, e):
                 with self.lock:
-                    if self.progress:
-                        self.progress.update(1)
-
-                return True
-
-            except Exception as e:
-                log.warning(f"线程 {thread_name} 下载 {filename} 第 {attempt} 次失败: {e}")
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except OSError:
-                        log.warning(f"无法删除损坏文件 {file_path}")
-                if attempt < MAX_RETRY:
-                    continue
-                else:
-                    log.error(f"线程 {thread_name} 下载 {filename} 连续失败 {MAX_RETRY} 次，放弃")
+                    self.abandoned_packages.add(package_name)
 
-                    # 更新进度条
-                    with self.lock:
-                        if self.progress:
-                            self.progress.update(1)
-                            
-                    return False
+            # 更新进度条
+            with self.lock:
+                if self.progress:
+                    self.progress.update(1)
 
+            return False
 
-    def worker_thread(self, worker_id: int, packages_data: dict):
-        """工作线程函数，处理分配的包"""
+    def settle_package_status(self, package_name: str, info: dict) -> str:
+        """
+        根据重试队列决定包的状态（调用方需持有锁）
+        - 仍有文件等待重试: retry_pending，last_downloaded_version 停留在最后一个完整下载的版本
+        - 有文件超过最大重试次数被放弃: outdated，下次运行重新下载（已保存的文件会跳过）
+        - 其余: up_to_date，last_downloaded_version 推进到 latest_releases 中的最新版本
+        """
+        if self.retry_queue.has_package(package_name):
+            info["status"] = "retry_pending"
+        elif package_name in self.abandoned_packages:
+            info["status"] = "outdated"
+            log.error(f"{package_name} 有文件超过最大重试次数，保持 outdated，停留在版本 "
+                      f"{info['last_downloaded_version']}，下次运行重新下载")
+        else:
+            info["status"] = "up_to_date"
+            if info.get("latest_releases"):
+                info["last_downloaded_version"] = list(info["latest_releases"])[-1]
+        return info["status"]
+
+    def worker_thread(self, worker_id: int, package_queue: queue.Queue):
+        """工作线程函数，从共享队列中领取包，空闲线程会继续领取剩余的包"""
 
         thread_name = f"Worker-{worker_id}"
-        for package_name, info in packages_data.items():
+        while True:
+            try:
+                package_name, info = package_queue.get_nowait()
+            except queue.Empty:
+                break
             last_downloaded_version = info["last_downloaded_version"]
-            failed = False  # 标记包是否失败
+            failed = False  # 标记包是否有文件失败
             for version, releases in info["latest_releases"].items():
                 for filename, file_info in releases.items():
+                    if self.manifest.contains(package_name, version, filename, file_info["sha256"]):
+                        # 之前运行中已下载成功的文件（例如同版本其他文件失败后重新下载）不再重复下载
+                        with self.lock:
+                            if self.progress:
+                                self.progress.update(1)
+                        continue
                     success = self.download_package(thread_name, package_name, version, filename, file_info["url"], file_info["sha256"])
                     if not success:
-                        failed = True
-                        break  # 任意文件失败，跳出当前版本循环
-                    else:
-                        last_downloaded_version = version
-                if failed:
-                    break  # 任意文件失败，跳出所有版本循环
+                        failed = True  # 失败的文件已加入重试队列，继续下载其余文件，已成功的文件保留
+                if not failed:
+                    last_downloaded_version = version  # 只推进到所有文件都已下载的版本
 
             # 下载完该包后处理状态
-            package_dir = os.path.join(self.download_dir, package_name, version)
             with self.lock:
+                info['last_downloaded_version'] = last_downloaded_version
+                self.settle_package_status(package_name, info)
                 if failed:
-                    # 删除下载失败的版本的目录，并保持 status 为 outdated
-                    if os.path.exists(package_dir):
-                        shutil.rmtree(package_dir)
-                        log.warning(f"线程 {thread_name} 下载 {package_name} 失败，保留版本 {last_downloaded_version} ，状态 outdated")
+                    log.warning(f"线程 {thread_name} 下载 {package_name} 部分文件失败，已加入重试队列，状态 {info['status']}")
                 else:
-                    # 全部文件下载成功，更新 status
-                    info['status'] = 'up_to_date'
                     log.debug(f"线程 {thread_name} 下载 {package_name} 成功，状态 up_to_date")
-                info['last_downloaded_version'] = last_downloaded_version
 
         log.info(f"{thread_name} 完成所有任务")
+
+    def retry_worker_thread(self, worker_id: int, task_queue: queue.Queue):
+        """重试线程函数，从共享队列中领取到期的重试记录"""
+
+        thread_name = f"Retry-{worker_id}"
+        while True:
+            try:
+                entry = task_queue.get_nowait()
+            except queue.Empty:
+                break
+            package_name = entry["package"]
+            self.download_package(thread_name, package_name, entry["version"], entry["filename"], entry["url"], entry["sha256"])
+
+            with self.lock:
+                info = self.packages_data.get(package_name)
+                # 重试期间包可能已被重新标记为 outdated，此时不修改状态
+                if info and info.get("status") == "retry_pending":
+                    self.settle_package_status(package_name, info)
+
+    def retry_failed_files(self, max_wait: float = RETRY_PASS_MAX_WAIT_SECONDS):
+        """
+        处理重试队列中到期的文件
+        若有文件将在 max_wait 秒内到期则等待后继续重试，其余留待下次运行
+        """
+        deadline = time.time() + max_wait
+        retried = 0
+        while True:
+            entries = self.retry_queue.due()
+            if not entries:
+                wait = self.retry_queue.next_due_in()
+                if wait is None or time.time() + wait > deadline:
+                    break
+                log.info(f"等待 {wait:.0f} 秒后重试失败的文件")
+                time.sleep(wait)
+                continue
+
+            log.info(f"开始重试 {len(entries)} 个失败的文件")
+            task_queue = queue.Queue()
+            for entry in entries:
+                task_queue.put(entry)
+
+            threads = []
+            for i in range(min(NUM_WORKERS, len(entries))):
+                thread = threading.Thread(
+                    target=self.retry_worker_thread,
+                    args=(i + 1, task_queue,)
+                )
+                threads.append(thread)
+                thread.start()
+            for thread in threads:
+                thread.join()
+            retried += len(entries)
+
+        if retried or len(self.retry_queue):
+            log.info(f"重试完成: 共重试 {retried} 次，剩余 {len(self.retry_queue)} 个文件留待下次运行")
+        self.retry_queue.save()
     
-    def clear_directory(self, folder_path: str = "data/packages") -> bool:
+    def clear_directory(self) -> bool:
         """
-        删除目录下所有内容，保留目录
+        按清单删除下载目录中的所有文件，保留目录
+        不再遍历目录，变空的目录在归档前按清单清理
         """
-        if not os.path.exists(folder_path):
-            log.warning(f"目录不存在: {folder_path}")
-            return False
-        
         try:
-            # 先删除整个目录
-            shutil.rmtree(folder_path)
-            # 然后重新创建空目录
-            os.makedirs(folder_path)
-            
-            log.info(f"成功清空目录: {folder_path}")
+            removed = self.manifest.clear_files()
+            log.info(f"成功清空目录: {self.download_dir}，删除 {removed} 个文件")
             return True
             
         except Exception as e:
-            log.error(f"清空目录失败 {folder_path}: {e}")
+            log.error(f"清空目录失败 {self.download_dir}: {e}")
             return False
 
-    def download_outdated_packages(self):
+    def download_outdated_packages(self, clear: bool = False, save: bool = True,
+                                   retry_wait: float = RETRY_PASS_MAX_WAIT_SECONDS):
         """
-        多线程下载所有 status 为 outdated 的包
+        多线程下载所有 status 为 outdated 的包，之后处理重试队列
+
+        Args:
+            clear: 下载前是否清空下载目录（包目录持久保存，只有分片的临时目录需要清空）
+            save: 下载完成后是否写回 JSON 文件（常驻进程自行增量持久化）
+            retry_wait: 重试阶段最多等待多久让退避中的文件到期（秒）
         """
 
-        # 清除所有旧数据
-        self.clear_directory()
+        # 清除分片目录中上次未合并的旧数据
+        if clear:
+            self.clear_directory()
            
         # 筛选所有 outdated 包
         outdated_packages = {name: info for name, info in self.packages_data.items() 
@@ -196,47 +312,28 @@ class PackagesDownloader:
         self.progress = tqdm(total=total_files, desc="下载进度", ncols=80)
 
         
-        """
-        将字典按键平均分配到多个列表中
-        """
-        all_keys = list(outdated_packages.keys())
-        total_items = len(all_keys)
-        items_per_worker = total_items // NUM_WORKERS
-        remainder = total_items % NUM_WORKERS
-        
-        workloads = []
-        start_idx = 0
-        
-        for i in range(NUM_WORKERS):
-            # 计算当前线程应该处理的项目数
-            current_items = items_per_worker + (1 if i < remainder else 0)
-            end_idx = start_idx + current_items
-            
-            # 提取对应的键，然后构建子字典
-            worker_keys = all_keys[start_idx:end_idx]
-            worker_dict = {k: outdated_packages[k] for k in worker_keys}
-            workloads.append(worker_dict)
-            
-            start_idx = end_idx
-
+        # 所有线程共享同一个任务队列，先完成的线程继续领取剩余的包
+        package_queue = queue.Queue()
+        for item in outdated_packages.items():
+            package_queue.put(item)
+        num_workers = min(NUM_WORKERS, len(outdated_packages))
 
         log.info("=" * 50)
         log.info("开始多线程包下载")
-        log.info(f"工作分配: {len(workloads)} 线程")
+        log.info(f"工作分配: {num_workers} 线程，{len(outdated_packages)} 个包")
         log.info("=" * 50)
         
         # 创建并启动工作线程
         threads = []
         start_time = time.time()
         
-        for i, workload in enumerate(workloads):
-            if workload:  # 只创建有工作的线程
-                thread = threading.Thread(
-                    target=self.worker_thread,
-                    args=(i + 1, workload,)
-                )
-                threads.append(thread)
-                thread.start()
+        for i in range(num_workers):
+            thread = threading.Thread(
+                target=self.worker_thread,
+                args=(i + 1, package_queue,)
+            )
+            threads.append(thread)
+            thread.start()
         
         # 等待所有工作线程完成
         for thread in threads:
@@ -245,14 +342,64 @@ class PackagesDownloader:
         end_time = time.time()
         log.info(f"多线程处理完成，耗时: {end_time - start_time:.2f}秒")
 
+        # 主下载完成后重试失败的文件
+        self.progress.close()
+        self.progress = None
+        self.retry_failed_files(retry_wait)
+        self.limiter.report()
+
         # 所有包下载完成后保存数据
-        self.save_packages()
+        if save:
+            self.save_packages()
+
+
+def prune_store(retention_days: int = STORE_RETENTION_DAYS) -> int:
+    """
+    按保留天数清理包目录中旧运行发布的文件，同步从简单索引中移除，并在变更流中记录已清理的 run_id
+    返回删除的文件数量
+    """
+    if not retention_days:
+        return 0
+    cutoff = (datetime.now() - timedelta(days=retention_days - 1)).strftime("%Y-%m-%d")
+
+    manifest = StoreManifest(DOWNLOAD_BASE_DIR)
+    try:
+        removed, max_run_id = manifest.prune_runs_before(cutoff)
+    finally:
+        manifest.close()
+
+    if removed:
+        SimpleIndexGenerator(packages_dir=DOWNLOAD_BASE_DIR).remove(removed)
+    if max_run_id:
+        Changefeed().mark_pruned(max_run_id)
+        log.info(f"已清理 {cutoff} 之前发布的 {len(removed)} 个文件（run_id <= {max_run_id}）")
+    return len(removed)
+
+
+def publish_downloaded_files(records: list) -> int:
+    """
+    将本次下载的文件发布到简单索引和变更流，并在清单中记录 run_id，返回本次运行的 run_id
+    之后按保留天数清理旧运行的文件
+    """
+    SimpleIndexGenerator(packages_dir=DOWNLOAD_BASE_DIR).update(records)
+    run_id = Changefeed().append_run(records)
+
+    manifest = StoreManifest(DOWNLOAD_BASE_DIR)
+    try:
+        manifest.set_run_id([StoreManifest.make_path(r["package"], r["version"], r["filename"]) for r in records], run_id)
+    finally:
+        manifest.close()
+
+    prune_store()
+    return run_id
 
 
 # --------------------------
 # 模块入口
 # --------------------------
-def main():
-    downloader = PackagesDownloader()
+def main(json_path: str = PACKAGES_JSON_PATH, download_dir: str = DOWNLOAD_BASE_DIR):
+    downloader = PackagesDownloader(json_path, download_dir)
     downloader.load_packages()
     downloader.download_outdated_packages()
+    publish_downloaded_files(downloader.downloaded_files)
+    return downloader
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import random
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Iterable
+from utils.logger import log
+from config import RETRY_BASE_DELAY_SECONDS, RETRY_MAX_DELAY_SECONDS, RETRY_MAX_ATTEMPTS
+
+RETRY_QUEUE_PATH = "data/retry_queue.json"
+
+
+class RetryQueue:
+    """
+    下载失败文件的持久化重试队列：
+    - 每个文件单独排队，失败不影响同一版本中已下载成功的文件
+    - 按指数退避 + 随机抖动安排下次重试时间
+    - 超过最大重试次数后放弃
+    """
+
+    def __init__(self, path: str = RETRY_QUEUE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: Dict[str, dict] = {}  # "包名/版本/文件名" -> 重试记录
+
+    @staticmethod
+    def make_key(package_name: str, version: str, filename: str) -> str:
+        return f"{package_name}/{version}/{filename}"
+
+    def load(self, path: Optional[str] = None, packages: Optional[Iterable[str]] = None):
+        """
+        从文件加载队列
+
+        Args:
+            path: 加载路径，默认为队列自身路径（分片节点从主队列中读取属于自己的记录）
+            packages: 只加载这些包的记录，None 表示全部
+        """
+        path = path or self.path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = {}
+        if packages is not None:
+            packages = set(packages)
+            entries = {k: v for k, v in entries.items() if v["package"] in packages}
+        with self.lock:
+            self.entries = entries
+        if entries:
+            log.info(f"重试队列中有 {len(entries)} 个待重试文件")
+
+    def save(self):
+        """将队列保存到文件"""
+        with self.lock:
+            entries = dict(self.entries)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, indent=2, ensure_ascii=False)
+
+    @staticmethod
+    def backoff(attempts: int) -> float:
+        """指数退避，取一半固定延迟 + 一半随机抖动，避免大量失败文件同时重试"""
+        delay = min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * (2 ** (attempts - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def add(self, package_name: str, version: str, filename: str, url: str, sha256: str,
+            error: str, delay: Optional[float] = None) -> bool:
+        """
+        记录一次失败并安排重试
+
+        Args:
+            delay: 指定重试延迟（秒），None 表示按退避策略计算
+
+        Returns:
+            True 表示已加入队列，False 表示超过最大重试次数已放弃
+        """
+        key = self.make_key(package_name, version, filename)
+        with self.lock:
+            entry = self.entries.get(key) or {
+                "package": package_name,
+                "version": version,
+                "filename": filename,
+                "attempts": 0,
+            }
+            entry.update({"url": url, "sha256": sha256, "last_error": str(error)})
+            entry["attempts"] += 1
+
+            if entry["attempts"] >= RETRY_MAX_ATTEMPTS:
+                self.entries.pop(key, None)
+                log.error(f"{filename} 已失败 {entry['attempts']} 次，放弃重试: {error}")
+                return False
+
+            wait = self.backoff(entry["attempts"]) if delay is None else delay
+            entry["next_retry_at"] = time.time() + wait
+            entry["next_retry_time"] = datetime.fromtimestamp(entry["next_retry_at"]).isoformat()
+            self.entries[key] = entry
+        log.debug(f"{filename} 加入重试队列，{wait:.0f} 秒后重试（第 {entry['attempts']} 次失败）")
+        return True
+
+    def remove(self, package_name: str, version: str, filename: str):
+        with self.lock:
+            self.entries.pop(self.make_key(package_name, version, filename), None)
+
+    def due(self) -> List[dict]:
+        """返回已到重试时间的记录"""
+        now = time.time()
+        with self.lock:
+            return [dict(e) for e in self.entries.values() if e["next_retry_at"] <= now]
+
+    def next_due_in(self) -> Optional[float]:
+        """距离最早一条记录到期的秒数，队列为空时返回 None"""
+        with self.lock:
+            if not self.entries:
+                return None
+            return max(0.0, min(e["next_retry_at"] for e in self.entries.values()) - time.time())
+
+    def has_package(self, package_name: str) -> bool:
+        with self.lock:
+            return any(e["package"] == package_name for e in self.entries.values())
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
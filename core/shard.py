@@ -0,0 +1,182 @@
+import os
+import json
+import bisect
+import shutil
+import hashlib
+from typing import Dict, Any, List, Tuple
+from utils.logger import log
+from utils.init_packages import DEFAULT_PACKAGE_TEMPLATE
+from core.package_manager import check_packages, load_from_file, save_to_file
+from core.packages_downloader import PackagesDownloader, publish_downloaded_files
+from core.retry_queue import RetryQueue, RETRY_QUEUE_PATH
+from utils.store_manifest import StoreManifest, has_manifest
+
+INIT_PACKAGES_PATH = "init_packages.json"
+PACKAGES_JSON_PATH = "data/packages.json"
+DOWNLOAD_BASE_DIR = "data/packages"
+SHARDS_DIR = "data/shards"
+VIRTUAL_NODES = 160  # 每个节点在哈希环上的虚拟节点数
+
+
+def _hash(key: str) -> int:
+    """稳定的哈希函数（不受 PYTHONHASHSEED 影响，保证各节点结果一致）"""
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """
+    一致性哈希环，按包名将包确定性地分配到 N 个节点
+    节点数变化时只有少量包需要迁移
+    """
+
+    def __init__(self, num_nodes: int, virtual_nodes: int = VIRTUAL_NODES):
+        if num_nodes < 1:
+            raise ValueError(f"节点数必须大于 0: {num_nodes}")
+        self.num_nodes = num_nodes
+        ring: List[Tuple[int, int]] = []
+        for node_id in range(num_nodes):
+            for v in range(virtual_nodes):
+                ring.append((_hash(f"node-{node_id}#{v}"), node_id))
+        ring.sort()
+        self.hashes = [h for h, _ in ring]
+        self.nodes = [n for _, n in ring]
+
+    def node_for(self, package_name: str) -> int:
+        """返回包所属的节点编号"""
+        idx = bisect.bisect(self.hashes, _hash(package_name.lower())) % len(self.hashes)
+        return self.nodes[idx]
+
+
+def shard_paths(node_id: int, num_nodes: int) -> Tuple[str, str]:
+    """返回分片的状态文件路径和下载目录"""
+    shard_dir = os.path.join(SHARDS_DIR, f"shard_{node_id}_of_{num_nodes}")
+    return os.path.join(shard_dir, "packages.json"), os.path.join(shard_dir, "packages")
+
+
+def shard_downloaded_path(json_path: str) -> str:
+    """返回分片本次下载文件记录的路径"""
+    return os.path.join(os.path.dirname(json_path), "downloaded.json")
+
+
+def load_shard_packages(node_id: int, num_nodes: int) -> Dict[str, Any]:
+    """
+    只读地加载属于当前节点的包数据
+    多个节点可能同时运行，因此这里不改写 data/packages.json
+    """
+    with open(INIT_PACKAGES_PATH, "r", encoding="utf-8") as f:
+        init_names = json.load(f)
+
+    canonical = {}
+    if os.path.isfile(PACKAGES_JSON_PATH):
+        with open(PACKAGES_JSON_PATH, "r", encoding="utf-8") as f:
+            canonical = json.load(f)
+
+    ring = ConsistentHashRing(num_nodes)
+    names = list(dict.fromkeys(list(canonical.keys()) + list(init_names)))
+    return {
+        name: canonical.get(name, DEFAULT_PACKAGE_TEMPLATE.copy())
+        for name in names
+        if ring.node_for(name) == node_id
+    }
+
+
+def run_shard(node_id: int, num_nodes: int):
+    """
+    分片模式：只对属于当前节点的包执行检查和下载，结果写入分片目录
+    """
+    if not 0 <= node_id < num_nodes:
+        raise ValueError(f"无效的分片编号 {node_id}，应在 0 到 {num_nodes - 1} 之间")
+
+    json_path, download_dir = shard_paths(node_id, num_nodes)
+    os.makedirs(os.path.dirname(json_path), exist_ok=True)
+
+    packages_data = load_shard_packages(node_id, num_nodes)
+    log.info(f"分片 {node_id}/{num_nodes} 分配到 {len(packages_data)} 个包")
+
+    final_data = check_packages(packages_data)
+    save_to_file(final_data, json_path)
+
+    downloader = PackagesDownloader(json_path, download_dir)
+    downloader.load_packages()
+    # 从主重试队列中取出属于本分片的记录
+    downloader.retry_queue.load(RETRY_QUEUE_PATH, packages=final_data.keys())
+    downloader.download_outdated_packages(clear=True)
+
+    # 下载记录留到合并时再发布，保证索引指向统一的包目录
+    with open(shard_downloaded_path(json_path), "w", encoding="utf-8") as f:
+        json.dump(downloader.downloaded_files, f, indent=2, ensure_ascii=False)
+
+
+def merge_shards(num_nodes: int):
+    """
+    合并 N 个分片的状态文件到 data/packages.json，并将各分片下载的文件移动到统一的包目录
+    """
+    shard_files = []
+    for node_id in range(num_nodes):
+        json_path, download_dir = shard_paths(node_id, num_nodes)
+        if os.path.isfile(json_path):
+            shard_files.append((node_id, json_path, download_dir))
+        else:
+            log.warning(f"分片 {node_id}/{num_nodes} 的状态文件不存在，跳过: {json_path}")
+
+    if not shard_files:
+        log.error(f"没有找到可合并的分片（共 {num_nodes} 个节点）")
+        return
+
+    packages_data = load_from_file(PACKAGES_JSON_PATH)
+
+    # 包目录持久保存，分片下载的文件并入其中
+    manifest = StoreManifest(DOWNLOAD_BASE_DIR)
+
+    merged_count = 0
+    moved_count = 0
+    downloaded_files = []
+    retry_queue = RetryQueue(RETRY_QUEUE_PATH)
+    retry_queue.load()
+    for node_id, json_path, download_dir in shard_files:
+        with open(json_path, "r", encoding="utf-8") as f:
+            shard_data = json.load(f)
+        packages_data.update(shard_data)
+        merged_count += len(shard_data)
+
+        # 分片的重试队列替换主队列中属于该分片的记录
+        shard_queue = RetryQueue(os.path.join(os.path.dirname(json_path), "retry_queue.json"))
+        shard_queue.load()
+        retry_queue.entries = {k: v for k, v in retry_queue.entries.items() if v["package"] not in shard_data}
+        retry_queue.entries.update(shard_queue.entries)
+
+        downloaded_path = shard_downloaded_path(json_path)
+        if os.path.isfile(downloaded_path):
+            with open(downloaded_path, "r", encoding="utf-8") as f:
+                downloaded_files.extend(json.load(f))
+
+        # 按分片清单移动分片下载的文件，并写入主清单
+        if has_manifest(download_dir):
+            shard_manifest = StoreManifest(download_dir)
+            rows = shard_manifest.rows()
+            shard_manifest.close()
+            for row in rows:
+                dst = manifest.full_path(row["path"])
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                os.replace(os.path.join(download_dir, *row["path"].split("/")), dst)
+            manifest.add_rows(rows)
+            moved_count += len(rows)
+        else:
+            # 没有清单的旧分片：遍历目录移动，文件不进入主清单
+            for root, dirs, files in os.walk(download_dir):
+                for file in files:
+                    src = os.path.join(root, file)
+                    dst = os.path.join(DOWNLOAD_BASE_DIR, os.path.relpath(src, download_dir))
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    os.replace(src, dst)
+                    moved_count += 1
+
+        # 合并完成后删除分片，避免下次重复合并过期的分片
+        shutil.rmtree(os.path.dirname(json_path))
+        log.info(f"已合并分片 {node_id}/{num_nodes}: {len(shard_data)} 个包")
+
+    manifest.close()
+    save_to_file(packages_data, PACKAGES_JSON_PATH)
+    retry_queue.save()
+    publish_downloaded_files(downloaded_files)
+    log.info(f"分片合并完成: {merged_count} 个包，{moved_count} 个文件")
@@ -0,0 +1,85 @@
+import os
+import json
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any
+from core.check_scheduler import is_due
+from core.package_health import circuit_state
+from core.retry_queue import RETRY_QUEUE_PATH
+from utils.changefeed import Changefeed
+from utils.store_manifest import StoreManifest, has_manifest
+from config import ADAPTIVE_CHECK_INTERVAL
+
+PACKAGES_JSON_PATH = "data/packages.json"
+DOWNLOAD_BASE_DIR = "data/packages"
+
+"""
+状态查询只读取本地状态文件，不导入网络相关模块、不创建日志文件，可以随时快速执行
+"""
+
+
+def _load_json(path: str, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def collect_status(json_path: str = PACKAGES_JSON_PATH) -> Dict[str, Any]:
+    """汇总本地状态"""
+    packages_data = _load_json(json_path, {})
+    now = datetime.now()
+
+    statuses = Counter(info.get("status") or "unchecked" for info in packages_data.values())
+    due = 0
+    circuits = []
+    for name, info in packages_data.items():
+        state = circuit_state(info, now)
+        if state == "open":
+            circuits.append(name)
+        elif not ADAPTIVE_CHECK_INTERVAL or is_due(info, now):
+            due += 1
+
+    last_checked = [info["last_checked"] for info in packages_data.values() if info.get("last_checked")]
+    retry_entries = _load_json(RETRY_QUEUE_PATH, {})
+
+    # 包目录的文件数和大小来自清单，不遍历目录
+    store_files, store_size = None, None
+    if has_manifest(DOWNLOAD_BASE_DIR):
+        manifest = StoreManifest(DOWNLOAD_BASE_DIR)
+        store_files, store_size, _ = manifest.stats()
+        manifest.close()
+
+    return {
+        "packages": len(packages_data),
+        "statuses": dict(statuses),
+        "due_for_check": due,
+        "open_circuits": sorted(circuits),
+        "retry_pending_files": len(retry_entries),
+        "last_checked": max(last_checked) if last_checked else None,
+        "last_run_id": Changefeed().load_state()["last_run_id"],
+        "store_files": store_files,
+        "store_size": store_size,
+    }
+
+
+def main(as_json: bool = False):
+    status = collect_status()
+    if as_json:
+        print(json.dumps(status, indent=2, ensure_ascii=False))
+        return
+
+    if not os.path.isfile(PACKAGES_JSON_PATH):
+        print(f"{PACKAGES_JSON_PATH} 不存在，尚未运行过检查")
+        return
+    print(f"包总数: {status['packages']}")
+    for name, count in sorted(status["statuses"].items(), key=lambda item: -item[1]):
+        print(f"  {name}: {count}")
+    print(f"到期待检查: {status['due_for_check']}")
+    print(f"熔断中: {len(status['open_circuits'])}" + (f" {status['open_circuits']}" if status['open_circuits'] else ""))
+    print(f"待重试文件: {status['retry_pending_files']}")
+    print(f"最近检查时间: {status['last_checked']}")
+    print(f"最新 run_id: {status['last_run_id']}")
+    if status["store_files"] is not None:
+        print(f"包目录: {status['store_files']} 个文件，{status['store_size'] / 1024 / 1024:.2f} MB")
@@ -1,34 +1,95 @@
 import requests
 import time
+import threading
 import urllib3
 from typing import Dict, Any, Optional
 from utils.logger import log
-from config import VERIFY_SSL
+from core.hedged_request import hedged_get
+from config import VERIFY_SSL, PYPI_INDEX_URLS
 
 # 禁用SSL警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
+# 缓存中保留的文件字段，其余字段对更新流程无用
+CACHED_FILE_FIELDS = ("filename", "url", "digests", "size", "upload_time", "upload_time_iso_8601", "yanked")
+
+
+class MetadataCache:
+    """
+    PyPI 元数据内存缓存（常驻进程使用）
+    按 URL 保存 ETag 和精简后的响应，下次请求时带上 If-None-Match，未变化时 PyPI 返回 304
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: Dict[str, tuple] = {}  # url -> (etag, data)
+
+    def get(self, url: str) -> Optional[tuple]:
+        with self.lock:
+            return self.entries.get(url)
+
+    def put(self, url: str, etag: str, data: Dict[str, Any]):
+        with self.lock:
+            self.entries[url] = (etag, data)
+
+    @staticmethod
+    def trim(data: Dict[str, Any]) -> Dict[str, Any]:
+        """只保留版本号和文件列表中用到的字段，降低常驻内存占用"""
+        return {
+            "info": {"version": data["info"]["version"]},
+            "releases": {
+                version: [{k: f[k] for k in CACHED_FILE_FIELDS if k in f} for f in files]
+                for version, files in data["releases"].items()
+            },
+        }
+
+
 class VersionChecker():
-    def __init__(self,package_name, thread_name):
+    def __init__(self, package_name, thread_name, session=None, metadata_cache: Optional[MetadataCache] = None,
+                 max_retries: int = 3):
         self.package_name = package_name
+        self.max_retries = max_retries  # 熔断探测时只请求一次
         self.thread_name = thread_name
+        self.http = session or requests  # 常驻进程传入共享的 Session 以复用连接
+        self.metadata_cache = metadata_cache
 
     def get_package_info_from_pypi(self) -> Optional[Dict[str, Any]]:
         """
         从PyPI获取包的最新信息（手动重试机制）
+        配置了多个上游时，慢请求会向下一个上游发起对冲请求，先返回的有效响应获胜
         """
-        url = f"https://pypi.org/pypi/{self.package_name}/json"
-        max_retries = 3
+        urls = [index_url.format(name=self.package_name) for index_url in PYPI_INDEX_URLS]
+        max_retries = self.max_retries
         retry_delay = 1  # 初始延迟秒数
         
         for attempt in range(max_retries):
             try:
                 log.debug(f"线程 {self.thread_name} 正在获取 {self.package_name} 的信息 (尝试 {attempt + 1}/{max_retries})")
-                response = requests.get(url, verify = VERIFY_SSL, timeout=8)
+                # 每个上游的 ETag 各自缓存
+                candidates = []
+                cached_entries = []
+                for url in urls:
+                    cached = self.metadata_cache.get(url) if self.metadata_cache else None
+                    headers = {"If-None-Match": cached[0]} if cached and cached[0] else {}
+                    candidates.append((url, headers))
+                    cached_entries.append(cached)
+
+                index, response = hedged_get(
+                    self.http, candidates,
+                    accept=lambda r: r.status_code in (200, 304),
+                    verify=VERIFY_SSL, timeout=8,
+                )
+                url, cached = urls[index], cached_entries[index]
+                if response.status_code == 304 and cached:
+                    log.debug(f"线程 {self.thread_name} {self.package_name} 的信息未变化，使用缓存")
+                    return cached[1], None
                 response.raise_for_status()
                 
                 data = response.json()
+                if self.metadata_cache:
+                    data = MetadataCache.trim(data)
+                    self.metadata_cache.put(url, response.headers.get("ETag"), data)
                 log.debug(f"线程 {self.thread_name} 成功获取 {self.package_name} 的信息")
                 
                 return data, None
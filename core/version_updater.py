@@ -3,6 +3,8 @@ from typing import Dict, Any, Optional
 from datetime import datetime
 from utils.logger import log
 from core.platform_analyser import PlatformAnalyser
+from core.check_scheduler import estimate_check_interval
+from core.package_health import record_success, record_failure
 
 
 """
@@ -89,13 +91,28 @@ class VersionUpdater():
                 status = self.status
                 result = {
                 "last_checked": datetime.now().isoformat(),
+                "check_interval": None,  # 出错的包下次运行重新检查
                 "status": status,
                 }
                 self.package_manager.packages_data[self.package_name].update(result)
-            
-            elif self.last_downloaded_version == self.latest_version:
+                record_failure(self.package_name, self.package_manager.packages_data[self.package_name], status)
+                return self.status
+
+            record_success(self.package_name, self.package_manager.packages_data[self.package_name])
+
+            if self.last_downloaded_version == self.latest_version:
                 # 如果无新版本则不更新
-                self.package_manager.packages_data[self.package_name].update({"last_checked": datetime.now().isoformat()})
+                info = self.package_manager.packages_data[self.package_name]
+                info.update({
+                    "last_checked": datetime.now().isoformat(),
+                    "check_interval": estimate_check_interval(self.releases),
+                })
+                if info.get("status") in ("ignore", "Network Error"):
+                    # 之前获取失败的包已恢复
+                    info["status"] = "up_to_date"
+                elif info.get("status") == "download_failed":
+                    # 旧版本遗留的下载失败状态：保留 latest_releases，重新下载（已保存的文件会跳过）
+                    info["status"] = "outdated"
 
             else:
                 status = "outdated" 
@@ -119,6 +136,7 @@ class VersionUpdater():
                 # 更新内存中的数据
                 result = {
                     "last_checked": datetime.now().isoformat(),
+                    "check_interval": estimate_check_interval(self.releases),
                     "latest_version": self.latest_version,
                     "status": status,
                     "latest_releases": releases
@@ -1,14 +1,164 @@
 import os
-from core.package_manager import run_package_workflow 
-from utils.archive_generator import main as archive_generator
-from utils.remove_empty_folders import remove_empty_folders_simple
+import sys
+import json
+import argparse
 from config import check_config
 
-if __name__ == "__main__":
-    os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    check_config()
-    run_package_workflow()
-    remove_empty_folders_simple()
+"""
+命令行入口，每个子命令只导入自己需要的模块：
+    python main.py                  完整流程：检查 -> 下载 -> 清理空目录 -> 归档（计划任务使用）
+    python main.py --force-check P  同上，并强制检查指定的包（等同于 run --force-check P，可重复指定）
+    python main.py check            只检查版本并更新 packages.json
+    python main.py download         只下载 outdated 的包并处理重试队列
+    python main.py archive          清理空目录并生成当天归档
+    python main.py status           查询本地状态（不访问网络）
+    python main.py verify           校验包目录完整性
+    python main.py changes N        输出 run_id N 之后新增的文件
+    python main.py shard I/N        分片模式
+    python main.py merge-shards N   合并分片并归档
+    python main.py daemon           常驻模式
+"""
+
+
+def cmd_run(args):
+    from core.package_manager import run_package_workflow
+    run_package_workflow(args.force_check)
+    cmd_archive(args)
+
+
+def cmd_check(args):
+    from core.package_manager import run_check_workflow
+    run_check_workflow(args.force_check)
+
+
+def cmd_download(args):
+    from core.packages_downloader import main as packages_downloader
+    packages_downloader()
+
+
+def cmd_archive(args):
+    from utils.remove_empty_folders import remove_empty_folders_touched
+    from utils.archive_generator import main as archive_generator
+    remove_empty_folders_touched()
     archive_generator()
 
 
+def cmd_status(args):
+    from core.status import main as show_status
+    show_status(args.json)
+
+
+def cmd_verify(args):
+    from utils.store_verifier import main as store_verifier
+    sys.exit(0 if store_verifier() else 1)
+
+
+def cmd_changes(args):
+    from utils.changefeed import Changefeed
+    changefeed = Changefeed()
+    last_run_id, changes = changefeed.changes_since(args.run_id)
+    pruned_run_id = changefeed.load_state().get("pruned_run_id", 0)
+    json.dump({"last_run_id": last_run_id, "pruned_run_id": pruned_run_id, "changes": changes},
+              sys.stdout, indent=2, ensure_ascii=False)
+
+
+def cmd_shard(args):
+    from core.shard import run_shard
+    node_id, num_nodes = args.shard
+    run_shard(node_id, num_nodes)
+
+
+def cmd_merge_shards(args):
+    from core.shard import merge_shards
+    merge_shards(args.nodes)
+    cmd_archive(args)
+
+
+def cmd_daemon(args):
+    from core.daemon import main as run_daemon
+    run_daemon()
+
+
+def shard_spec(value: str):
+    """解析分片参数 I/N，返回 (I, N)"""
+    try:
+        node_id, num_nodes = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的分片参数 {value!r}，应为 I/N，例如 0/2")
+    if num_nodes < 1:
+        raise argparse.ArgumentTypeError(f"无效的节点数 {num_nodes}，应为正整数")
+    if not 0 <= node_id < num_nodes:
+        raise argparse.ArgumentTypeError(f"无效的分片编号 {node_id}，应在 0 到 {num_nodes - 1} 之间")
+    return node_id, num_nodes
+
+
+def positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"无效的节点数 {value!r}，应为正整数")
+    return number
+
+
+def parse_args(argv=None):
+    # 每个 --force-check 只接受一个包名（可重复指定），避免吞掉后面的子命令
+    # 子命令上的选项使用单独的 dest，解析后与顶层的合并，防止子命令的默认值覆盖顶层的值
+    force_check = argparse.ArgumentParser(add_help=False)
+    force_check.add_argument("--force-check", dest="sub_force_check", action="append", default=[], metavar="PKG",
+                             help="无论是否到期都强制检查该包，可重复指定")
+
+    # 顶层也接受 --force-check，保持 python main.py --force-check PKG 的用法
+    parser = argparse.ArgumentParser(description="PyPI 包自动更新工具")
+    parser.add_argument("--force-check", action="append", default=[], metavar="PKG",
+                        help="无论是否到期都强制检查该包，可重复指定（用于 run 和 check）")
+    parser.set_defaults(func=cmd_run, sub_force_check=[])
+    subparsers = parser.add_subparsers(title="子命令", metavar="COMMAND")
+
+    sub = subparsers.add_parser("run", parents=[force_check], help="完整流程：检查、下载、清理空目录、归档（默认）")
+    sub.set_defaults(func=cmd_run)
+
+    sub = subparsers.add_parser("check", parents=[force_check], help="只检查版本并更新 packages.json")
+    sub.set_defaults(func=cmd_check)
+
+    sub = subparsers.add_parser("download", help="只下载 outdated 的包并处理重试队列")
+    sub.set_defaults(func=cmd_download)
+
+    sub = subparsers.add_parser("archive", help="清理空目录并生成当天归档")
+    sub.set_defaults(func=cmd_archive)
+
+    sub = subparsers.add_parser("status", help="查询本地状态（不访问网络）")
+    sub.add_argument("--json", action="store_true", help="以 JSON 输出")
+    sub.set_defaults(func=cmd_status)
+
+    sub = subparsers.add_parser("verify", help="校验包目录中文件的 sha256，损坏或缺失的文件加入重试队列")
+    sub.set_defaults(func=cmd_verify)
+
+    sub = subparsers.add_parser("changes", help="以 JSON 输出 RUN_ID 之后新增的文件（0 表示全部）")
+    sub.add_argument("run_id", type=int, metavar="RUN_ID")
+    sub.set_defaults(func=cmd_changes)
+
+    sub = subparsers.add_parser("shard", help="分片模式：只检查并下载第 I 个分片的包（共 N 个节点，I 从 0 开始）")
+    sub.add_argument("shard", type=shard_spec, metavar="I/N")
+    sub.set_defaults(func=cmd_shard)
+
+    sub = subparsers.add_parser("merge-shards", help="合并 N 个分片的结果，并清理空目录、生成归档")
+    sub.add_argument("nodes", type=positive_int, metavar="N")
+    sub.set_defaults(func=cmd_merge_shards)
+
+    sub = subparsers.add_parser("daemon", help="常驻模式：按间隔循环检查和下载，可通过控制端口立即触发")
+    sub.set_defaults(func=cmd_daemon)
+
+    args = parser.parse_args(argv)
+    args.force_check = args.force_check + args.sub_force_check
+    if args.force_check and args.func not in (cmd_run, cmd_check):
+        parser.error("--force-check 只能用于 run 和 check")
+    return args
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    args = parse_args()
+    check_config()
+    args.func(args)
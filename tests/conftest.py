@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class StubServer:
+    """
+    本地 HTTP 桩服务器：按路径返回预设的响应，可注入固定延迟
+    routes: {路径: (状态码, 响应体)}，未配置的路径返回 404
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.routes = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.path)
+                time.sleep(server.delay)
+                status, body = server.routes.get(self.path, (404, b"not found"))
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 对冲落败的请求已被客户端关闭
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_app(tmp_path, stub_url: str) -> str:
+    """复制一份程序到临时目录，并将上游指向桩服务器，用于以子进程运行 main.py"""
+    app_dir = tmp_path / "app"
+    app_dir.mkdir()
+    for name in ("main.py", "config.py"):
+        shutil.copy(os.path.join(ROOT, name), app_dir / name)
+    for name in ("core", "utils"):
+        shutil.copytree(os.path.join(ROOT, name), app_dir / name, ignore=shutil.ignore_patterns("__pycache__"))
+    with open(app_dir / "config.py", "a", encoding="utf-8") as f:
+        f.write(f'\nPYPI_INDEX_URLS = ["{stub_url}pypi/{{name}}/json"]\n')
+        f.write(f'FILE_MIRROR_URLS = ["{stub_url}"]\n')
+        f.write("RETRY_PASS_MAX_WAIT_SECONDS = 0\n")
+    return str(app_dir)
+
+
+def run_main(app_dir: str, *args) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "main.py", *args], cwd=app_dir, capture_output=True,
+                          text=True, encoding="utf-8", timeout=120)
+
+
+def file_content(name: str, version: str) -> bytes:
+    return f"{name} {version} source".encode()
+
+
+def add_package(server: StubServer, name: str, versions=("1.0",), file_status: int = 200) -> dict:
+    """在桩服务器上发布一个包（每个版本一个源码包，最后一个版本为最新版），返回 {版本: 文件名}"""
+    filenames = {}
+    releases = {}
+    for version in versions:
+        filename = f"{name}-{version}.tar.gz"
+        content = file_content(name, version)
+        server.routes[f"/packages/{name}/{filename}"] = (file_status, content if file_status == 200 else b"error")
+        releases[version] = [{
+            "filename": filename,
+            "url": f"https://files.pythonhosted.org/packages/{name}/{filename}",
+            "digests": {"sha256": hashlib.sha256(content).hexdigest()},
+            "upload_time": "2025-01-01T00:00:00",
+        }]
+        filenames[version] = filename
+    metadata = {"info": {"version": versions[-1]}, "releases": releases}
+    server.routes[f"/pypi/{name}/json"] = (200, json.dumps(metadata).encode())
+    return filenames
+
+
+@pytest.fixture
+def stub_server():
+    """返回创建桩服务器的函数，测试结束时全部关闭"""
+    servers = []
+
+    def start(delay: float = 0) -> StubServer:
+        server = StubServer(delay)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture(autouse=True)
+def chdir_tmp(tmp_path, monkeypatch):
+    """模块使用 data/ 下的相对路径，每个测试在独立的临时目录中运行"""
+    monkeypatch.chdir(tmp_path)
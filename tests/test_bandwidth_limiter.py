@@ -0,0 +1,97 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from utils import bandwidth_limiter
+from utils.bandwidth_limiter import BandwidthLimiter
+
+MB = 1024 * 1024
+
+
+class FakeClock:
+    """替换限速器使用的 time 模块，sleep 只推进时间"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept += seconds
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(bandwidth_limiter, "time", SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    return clock
+
+
+def test_rate_is_capped(clock):
+    limiter = BandwidthLimiter(MB)
+    for _ in range(160):
+        limiter.consume(64 * 1024)
+
+    # 10 MB 中前 1 MB 是桶内的突发额度，其余按 1 MB/s 偿还
+    assert clock.now == pytest.approx(9.0)
+    assert limiter.consumed_bytes == 10 * MB
+
+
+def test_unlimited_never_sleeps(clock):
+    limiter = BandwidthLimiter(0)
+    limiter.consume(100 * MB)
+    assert clock.slept == 0
+
+
+@pytest.mark.parametrize("hour, minute, rate", [
+    (21, 59, 0),
+    (22, 0, 100),
+    (23, 30, 100),
+    (0, 0, 100),
+    (5, 59, 100),
+    (6, 0, 0),
+    (12, 0, 0),
+])
+def test_schedule_window_crosses_midnight(hour, minute, rate):
+    limiter = BandwidthLimiter(0, [("22:00", "06:00", 100)])
+    assert limiter.current_rate(datetime(2025, 6, 1, hour, minute)) == rate
+
+
+def test_schedule_overrides_default_rate():
+    limiter = BandwidthLimiter(MB, [("08:00", "20:00", 0)])
+    assert limiter.current_rate(datetime(2025, 6, 1, 9, 0)) == 0
+    assert limiter.current_rate(datetime(2025, 6, 1, 20, 0)) == MB
+
+
+def test_report_compares_actual_and_budget(clock, capsys):
+    limiter = BandwidthLimiter(MB)
+    limiter.consume(2 * MB)  # 透支 1 MB，睡眠 1 秒
+    clock.now += 3  # 之后空闲 3 秒
+
+    limiter.report()
+
+    out = capsys.readouterr().out
+    assert "实际吞吐 0.50 MB/s" in out
+    assert "限速预算: 1.00 MB/s，预算利用率 50.0%" in out
+
+
+def test_report_counts_unlimited_window(clock, capsys):
+    rates = [MB]
+    limiter = BandwidthLimiter(MB)
+    limiter.current_rate = lambda now=None: rates[0]
+
+    limiter.consume(MB)
+    clock.now += 1
+    rates[0] = 0  # 进入不限速时段
+    limiter.consume(MB)
+    clock.now += 2
+
+    limiter.report()
+
+    out = capsys.readouterr().out
+    assert clock.slept == 0
+    assert "预算利用率 100.0%（其中 2.00 秒处于不限速时段）" in out
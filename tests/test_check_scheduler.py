@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+
+from core import check_scheduler
+from core.check_scheduler import estimate_check_interval, is_due, select_due_packages
+
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+HOUR = 3600
+
+
+def releases_at(*days_ago: float) -> dict:
+    """构造在 NOW 之前若干天发布的版本"""
+    return {
+        f"1.{i}": [{"upload_time_iso_8601": (NOW - timedelta(days=d)).isoformat().replace("+00:00", "Z")}]
+        for i, d in enumerate(sorted(days_ago, reverse=True))
+    }
+
+
+def test_interval_follows_release_cadence():
+    # 每 8 天发布一次，最近一次在 1 天前：8 天 * 0.25 = 2 天
+    interval = estimate_check_interval(releases_at(25, 17, 9, 1), NOW)
+    assert interval == 2 * 24 * HOUR
+
+
+def test_interval_grows_when_releases_stop():
+    # 发布周期 1 天，但已 20 天未发布：以 20 天为准
+    interval = estimate_check_interval(releases_at(22, 21, 20), NOW)
+    assert interval == 5 * 24 * HOUR
+
+
+def test_interval_is_clamped():
+    assert estimate_check_interval(releases_at(0.02, 0.01), NOW) == check_scheduler.CHECK_INTERVAL_MIN_HOURS * HOUR
+    assert estimate_check_interval(releases_at(400, 300), NOW) == check_scheduler.CHECK_INTERVAL_MAX_HOURS * HOUR
+
+
+def test_single_release_uses_time_since_release():
+    # 昨天刚发布第一个版本的项目：1 天 * 0.25 = 6 小时，而不是最大间隔
+    assert estimate_check_interval(releases_at(1), NOW) == 6 * HOUR
+    assert estimate_check_interval({}, NOW) == check_scheduler.CHECK_INTERVAL_MAX_HOURS * HOUR
+    assert estimate_check_interval({"1.0": []}, NOW) == check_scheduler.CHECK_INTERVAL_MAX_HOURS * HOUR
+
+
+def test_is_due():
+    now = datetime(2025, 6, 1, 12, 0)
+    assert is_due({"last_checked": None, "check_interval": None}, now)
+    assert is_due({"last_checked": "2025-06-01T10:00:00", "check_interval": 2 * HOUR}, now)
+    assert not is_due({"last_checked": "2025-06-01T11:00:00", "check_interval": 2 * HOUR}, now)
+    assert is_due({"last_checked": "garbage", "check_interval": HOUR}, now)
+
+
+def test_select_due_packages_skips_fresh_and_open_circuits(monkeypatch):
+    monkeypatch.setattr(check_scheduler, "FORCE_CHECK_PACKAGES", ["configured"])
+    now = datetime.now()
+    fresh = {"last_checked": now.isoformat(), "check_interval": 24 * HOUR, "health": None}
+    stale = {"last_checked": (now - timedelta(days=2)).isoformat(), "check_interval": 24 * HOUR, "health": None}
+    tripped = dict(stale, health={"circuit_open_until": (now + timedelta(hours=1)).isoformat()})
+    expired = dict(stale, health={"circuit_open_until": (now - timedelta(hours=1)).isoformat()})
+    packages_data = {
+        "fresh": fresh,
+        "stale": stale,
+        "new": {"last_checked": None, "check_interval": None, "health": None},
+        "tripped": tripped,
+        "half-open": expired,
+        "forced": fresh,
+        "forced-tripped": tripped,
+        "configured": fresh,
+    }
+
+    due = select_due_packages(packages_data, force_packages=["forced", "forced-tripped"])
+
+    assert sorted(due) == ["configured", "forced", "forced-tripped", "half-open", "new", "stale"]
+
+
+def test_select_due_packages_without_adaptive_interval(monkeypatch):
+    monkeypatch.setattr(check_scheduler, "ADAPTIVE_CHECK_INTERVAL", False)
+    fresh = {"last_checked": datetime.now().isoformat(), "check_interval": 24 * HOUR, "health": None}
+    assert select_due_packages({"fresh": fresh}) == ["fresh"]
@@ -0,0 +1,147 @@
+import os
+import json
+import urllib.request
+
+import pytest
+
+from core import daemon as daemon_module
+from core.daemon import UpdaterDaemon
+
+
+def write_init_packages(names):
+    with open("init_packages.json", "w", encoding="utf-8") as f:
+        json.dump({name: None for name in names}, f)
+
+
+@pytest.fixture
+def recorded_checks(monkeypatch):
+    """替换版本检查，只记录每轮强制检查的包"""
+    calls = []
+
+    def fake_check_packages(packages_data, session=None, metadata_cache=None, force_packages=None):
+        calls.append(force_packages)
+        return packages_data
+
+    monkeypatch.setattr(daemon_module, "check_packages", fake_check_packages)
+    return calls
+
+
+@pytest.fixture
+def stamping_checks(monkeypatch):
+    """替换版本检查：每轮更新所有包的 last_checked，并将 new_versions 中的包更新到指定版本"""
+    new_versions = {}
+    rounds = []
+
+    def fake_check_packages(packages_data, session=None, metadata_cache=None, force_packages=None):
+        rounds.append(sorted(packages_data))
+        for name, entry in packages_data.items():
+            entry["last_checked"] = f"round-{len(rounds)}"
+            if name in new_versions:
+                entry["latest_version"] = new_versions[name]
+                entry["status"] = "up_to_date"
+        return packages_data
+
+    monkeypatch.setattr(daemon_module, "check_packages", fake_check_packages)
+    return new_versions
+
+
+def read_journal() -> list:
+    with open(daemon_module.JOURNAL_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def read_packages_json() -> dict:
+    with open(daemon_module.PACKAGES_JSON_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def post(daemon: UpdaterDaemon, path: str) -> dict:
+    request = urllib.request.Request(f"http://127.0.0.1:{daemon.server.server_port}{path}", method="POST")
+    with urllib.request.urlopen(request) as response:
+        assert response.status == 202
+        return json.loads(response.read())
+
+
+def test_manual_trigger_forces_checks(recorded_checks):
+    write_init_packages(["a", "b", "c"])
+    daemon = UpdaterDaemon(control_port=0)
+    daemon.start_control_server()
+    try:
+        # 按间隔执行的轮次只检查到期的包
+        daemon.run_cycle()
+        assert recorded_checks[-1] == []
+
+        assert post(daemon, "/run")["force_packages"] == "all"
+        assert daemon.wakeup.is_set()
+        daemon.run_cycle()
+        assert sorted(recorded_checks[-1]) == ["a", "b", "c"]
+
+        assert post(daemon, "/run?packages=a,c")["force_packages"] == ["a", "c"]
+        daemon.run_cycle()
+        assert recorded_checks[-1] == ["a", "c"]
+
+        # 强制检查只作用于被触发的那一轮
+        daemon.run_cycle()
+        assert recorded_checks[-1] == []
+    finally:
+        daemon.server.shutdown()
+        daemon.server.server_close()
+
+
+def test_journal_records_changes_and_last_checked(stamping_checks):
+    write_init_packages(["a", "b"])
+    stamping_checks["a"] = "2.0"
+    daemon = UpdaterDaemon(control_port=0, compact_cycles=100)
+
+    daemon.run_cycle()
+
+    # 数据变化的包记录完整数据，只有检查时间变化的包只记录 last_checked
+    records = {record["name"]: record for record in read_journal()}
+    assert records["a"]["entry"]["latest_version"] == "2.0"
+    assert records["b"] == {"name": "b", "last_checked": "round-1"}
+    assert read_packages_json()["b"]["last_checked"] is None
+
+    # 重启后回放日志，合并回 packages.json 并清空日志
+    state = UpdaterDaemon(control_port=0).packages_data
+    assert state["a"]["latest_version"] == "2.0"
+    assert state["b"]["last_checked"] == "round-1"
+    assert read_packages_json() == state
+    assert not os.path.exists(daemon_module.JOURNAL_PATH)
+
+
+def test_replay_ignores_truncated_record(stamping_checks):
+    write_init_packages(["a"])
+    daemon = UpdaterDaemon(control_port=0, compact_cycles=100)
+    daemon.run_cycle()
+    with open(daemon_module.JOURNAL_PATH, "a", encoding="utf-8") as f:
+        f.write('{"name": "a", "entry": {"latest_ver')  # 写到一半时进程退出
+
+    state = UpdaterDaemon(control_port=0).packages_data
+
+    assert state["a"]["last_checked"] == "round-1"
+    assert read_packages_json() == state
+
+
+def test_compaction_every_n_cycles(stamping_checks):
+    write_init_packages(["a"])
+    daemon = UpdaterDaemon(control_port=0, compact_cycles=2)
+
+    daemon.run_cycle()
+    assert len(read_journal()) == 1
+
+    daemon.run_cycle()
+    assert not os.path.exists(daemon_module.JOURNAL_PATH)
+    assert read_packages_json()["a"]["last_checked"] == "round-2"
+
+
+def test_new_init_packages_are_picked_up_each_cycle(stamping_checks):
+    write_init_packages(["a"])
+    daemon = UpdaterDaemon(control_port=0, compact_cycles=100)
+    daemon.run_cycle()
+
+    write_init_packages(["a", "b"])
+    daemon.run_cycle()
+
+    assert sorted(daemon.packages_data) == ["a", "b"]
+    assert [record["entry"]["last_checked"] for record in read_journal() if record["name"] == "b"] == ["round-2"]
+    assert sorted(UpdaterDaemon(control_port=0).packages_data) == ["a", "b"]
@@ -0,0 +1,176 @@
+import json
+import time
+import hashlib
+
+import pytest
+import requests
+
+from core import hedged_request, version_checker, packages_downloader
+from core.hedged_request import LatencyTracker, hedged_get, upstream_of
+from core.version_checker import VersionChecker
+from core.packages_downloader import PackagesDownloader
+
+PRIMARY_DELAY = 1.0  # 慢上游的注入延迟（秒）
+
+
+@pytest.fixture(autouse=True)
+def latency_tracker(monkeypatch):
+    """每个测试使用独立的延迟统计"""
+    tracker = LatencyTracker()
+    monkeypatch.setattr(hedged_request, "latency_tracker", tracker)
+    return tracker
+
+
+def accept_ok(response):
+    return response.status_code == 200
+
+
+def warm_up(tracker, url: str, seconds: float):
+    """填充足够的延迟样本，使对冲延迟取分位数而不是默认值"""
+    for _ in range(hedged_request.HEDGE_MIN_SAMPLES):
+        tracker.record(upstream_of(url), seconds)
+
+
+def test_slow_primary_is_hedged_after_percentile_delay(stub_server, latency_tracker):
+    primary, secondary = stub_server(delay=PRIMARY_DELAY), stub_server()
+    primary.routes["/x"] = (200, b"primary")
+    secondary.routes["/x"] = (200, b"secondary")
+    warm_up(latency_tracker, primary.url, 0.3)
+    hedge_delay = latency_tracker.hedge_delay(upstream_of(primary.url))
+    assert hedge_delay == pytest.approx(0.3)
+
+    start = time.monotonic()
+    index, response = hedged_get(requests, [(primary.url + "x", None), (secondary.url + "x", None)], accept_ok)
+    elapsed = time.monotonic() - start
+
+    assert index == 1 and response.content == b"secondary"
+    assert hedge_delay <= elapsed < PRIMARY_DELAY
+    assert primary.requests == ["/x"] and secondary.requests == ["/x"]
+
+
+def test_fast_primary_is_not_hedged(stub_server, latency_tracker):
+    primary, secondary = stub_server(), stub_server()
+    primary.routes["/x"] = (200, b"primary")
+    warm_up(latency_tracker, primary.url, 0.3)
+
+    index, response = hedged_get(requests, [(primary.url + "x", None), (secondary.url + "x", None)], accept_ok)
+
+    assert index == 0 and response.content == b"primary"
+    assert secondary.requests == []
+
+
+def test_primary_404_fails_over_immediately(stub_server):
+    primary, secondary = stub_server(), stub_server()
+    secondary.routes["/x"] = (200, b"secondary")
+
+    start = time.monotonic()
+    index, response = hedged_get(requests, [(primary.url + "x", None), (secondary.url + "x", None)], accept_ok)
+
+    assert index == 1 and response.content == b"secondary"
+    # 不等待默认对冲延迟
+    assert time.monotonic() - start < hedged_request.HEDGE_DEFAULT_DELAY_SECONDS
+
+
+def test_primary_connection_error_fails_over_immediately(stub_server):
+    closed = stub_server()
+    closed.close()  # 端口不再监听，连接被拒绝
+    secondary = stub_server()
+    secondary.routes["/x"] = (200, b"secondary")
+
+    start = time.monotonic()
+    index, response = hedged_get(requests, [(closed.url + "x", None), (secondary.url + "x", None)], accept_ok,
+                                 timeout=5)
+
+    assert index == 1 and response.content == b"secondary"
+    assert time.monotonic() - start < hedged_request.HEDGE_DEFAULT_DELAY_SECONDS
+
+
+def test_all_upstreams_fail_raises_highest_priority_error(stub_server):
+    primary, secondary = stub_server(delay=0.2), stub_server()
+    primary.routes["/x"] = (404, b"not found")
+    secondary.routes["/x"] = (500, b"error")
+
+    with pytest.raises(requests.HTTPError) as exc_info:
+        hedged_get(requests, [(primary.url + "x", None), (secondary.url + "x", None)], accept_ok)
+
+    assert exc_info.value.response.status_code == 404
+
+
+def package_metadata(version: str) -> bytes:
+    return json.dumps({"info": {"version": version}, "releases": {version: []}}).encode()
+
+
+def test_version_checker_fails_over_to_secondary_index(stub_server, monkeypatch):
+    primary, secondary = stub_server(), stub_server()
+    secondary.routes["/pypi/six/json"] = (200, package_metadata("1.17.0"))
+    monkeypatch.setattr(version_checker, "PYPI_INDEX_URLS",
+                        [primary.url + "pypi/{name}/json", secondary.url + "pypi/{name}/json"])
+
+    data, status = VersionChecker("six", "Test").get_package_info_from_pypi()
+
+    assert status is None and data["info"]["version"] == "1.17.0"
+    assert primary.requests == ["/pypi/six/json"]
+
+
+def test_version_checker_hedges_slow_primary_index(stub_server, monkeypatch, latency_tracker):
+    primary, secondary = stub_server(delay=PRIMARY_DELAY), stub_server()
+    primary.routes["/pypi/six/json"] = (200, package_metadata("1.16.0"))
+    secondary.routes["/pypi/six/json"] = (200, package_metadata("1.17.0"))
+    monkeypatch.setattr(version_checker, "PYPI_INDEX_URLS",
+                        [primary.url + "pypi/{name}/json", secondary.url + "pypi/{name}/json"])
+    warm_up(latency_tracker, primary.url, 0.3)
+
+    start = time.monotonic()
+    data, status = VersionChecker("six", "Test").get_package_info_from_pypi()
+
+    assert status is None and data["info"]["version"] == "1.17.0"
+    assert time.monotonic() - start < PRIMARY_DELAY
+
+
+def test_version_checker_all_indexes_404(stub_server, monkeypatch):
+    primary, secondary = stub_server(), stub_server()
+    monkeypatch.setattr(version_checker, "PYPI_INDEX_URLS",
+                        [primary.url + "pypi/{name}/json", secondary.url + "pypi/{name}/json"])
+
+    data, status = VersionChecker("missing", "Test").get_package_info_from_pypi()
+
+    assert data is None and status == "ignore"
+
+
+def test_mirror_serving_wrong_bytes_falls_back_to_next_mirror(stub_server, monkeypatch, tmp_path):
+    bad_mirror, good_mirror = stub_server(), stub_server(delay=PRIMARY_DELAY)
+    content = b"real content"
+    bad_mirror.routes["/packages/demo-1.0.tar.gz"] = (200, b"tampered content")
+    good_mirror.routes["/packages/demo-1.0.tar.gz"] = (200, content)
+    monkeypatch.setattr(packages_downloader, "FILE_MIRROR_URLS", [bad_mirror.url, good_mirror.url])
+
+    downloader = PackagesDownloader(str(tmp_path / "packages.json"), str(tmp_path / "packages"))
+    ok = downloader.download_package("Test", "demo", "1.0", "demo-1.0.tar.gz",
+                                     "https://files.pythonhosted.org/packages/demo-1.0.tar.gz",
+                                     hashlib.sha256(content).hexdigest())
+
+    # 快速镜像返回的内容被 sha256 校验拒绝，改从下一个镜像下载
+    assert ok
+    assert (tmp_path / "packages" / "demo" / "1.0" / "demo-1.0.tar.gz").read_bytes() == content
+    assert downloader.manifest.paths() == ["demo/1.0/demo-1.0.tar.gz"]
+    assert not downloader.retry_queue.has_package("demo")
+    assert bad_mirror.requests == good_mirror.requests == ["/packages/demo-1.0.tar.gz"]
+    downloader.manifest.close()
+
+
+def test_wrong_bytes_from_every_mirror_is_queued_for_retry(stub_server, monkeypatch, tmp_path):
+    mirrors = [stub_server(), stub_server()]
+    for mirror in mirrors:
+        mirror.routes["/packages/demo-1.0.tar.gz"] = (200, b"tampered content")
+    monkeypatch.setattr(packages_downloader, "FILE_MIRROR_URLS", [mirror.url for mirror in mirrors])
+
+    downloader = PackagesDownloader(str(tmp_path / "packages.json"), str(tmp_path / "packages"))
+    ok = downloader.download_package("Test", "demo", "1.0", "demo-1.0.tar.gz",
+                                     "https://files.pythonhosted.org/packages/demo-1.0.tar.gz",
+                                     hashlib.sha256(b"real content").hexdigest())
+
+    assert not ok
+    assert not (tmp_path / "packages" / "demo" / "1.0" / "demo-1.0.tar.gz").exists()
+    assert downloader.manifest.paths() == []
+    assert downloader.retry_queue.has_package("demo")
+    downloader.manifest.close()
@@ -0,0 +1,29 @@
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize("argv, func, force_check", [
+    ([], main.cmd_run, []),
+    (["--force-check", "six"], main.cmd_run, ["six"]),
+    (["--force-check", "a", "--force-check", "b"], main.cmd_run, ["a", "b"]),
+    (["--force-check", "a", "check"], main.cmd_check, ["a"]),
+    (["check", "--force-check", "a"], main.cmd_check, ["a"]),
+    (["--force-check", "a", "run", "--force-check", "b"], main.cmd_run, ["a", "b"]),
+    (["download"], main.cmd_download, []),
+])
+def test_force_check_parsing(argv, func, force_check):
+    args = main.parse_args(argv)
+    assert args.func is func
+    assert args.force_check == force_check
+
+
+@pytest.mark.parametrize("argv", [
+    ["--force-check", "a", "download"],  # 子命令不会被当作包名吞掉，且 download 不检查版本
+    ["status", "--force-check", "a"],
+])
+def test_force_check_rejected_for_other_commands(argv, capsys):
+    with pytest.raises(SystemExit) as exc_info:
+        main.parse_args(argv)
+    assert exc_info.value.code == 2
+    assert "--force-check" in capsys.readouterr().err
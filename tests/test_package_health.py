@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from core import package_health
+from core.package_health import circuit_state, open_circuits, record_failure, record_success
+
+
+@pytest.fixture(autouse=True)
+def circuit_config(monkeypatch):
+    monkeypatch.setattr(package_health, "CIRCUIT_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(package_health, "CIRCUIT_BASE_OPEN_HOURS", 1)
+    monkeypatch.setattr(package_health, "CIRCUIT_MAX_OPEN_HOURS", 4)
+
+
+def open_hours(info: dict) -> float:
+    """本次熔断的时长（小时）"""
+    health = info["health"]
+    opened_at = datetime.fromisoformat(health["last_failure"])
+    return (datetime.fromisoformat(health["circuit_open_until"]) - opened_at) / timedelta(hours=1)
+
+
+def after_circuit(info: dict) -> datetime:
+    """熔断到期后的时间点"""
+    return datetime.fromisoformat(info["health"]["circuit_open_until"]) + timedelta(seconds=1)
+
+
+def test_circuit_opens_after_threshold():
+    info = {"health": None}
+    assert circuit_state(info) == "closed"
+
+    record_failure("demo", info, "timeout")
+    assert circuit_state(info) == "closed"
+    assert info["health"]["consecutive_failures"] == 1
+
+    record_failure("demo", info, "timeout")
+    assert circuit_state(info) == "open"
+    assert open_hours(info) == 1
+    assert open_circuits({"demo": info, "ok": {"health": None}}) == ["demo"]
+
+
+def test_failed_probes_double_open_time_up_to_cap():
+    info = {"health": None}
+    record_failure("demo", info, "timeout")
+    record_failure("demo", info, "timeout")
+
+    hours = []
+    for _ in range(4):
+        assert circuit_state(info, after_circuit(info)) == "half_open"
+        record_failure("demo", info, "ignore")  # 探测失败，以更长的时间重新熔断
+        assert circuit_state(info) == "open"
+        hours.append(open_hours(info))
+
+    assert hours == [2, 4, 4, 4]
+    assert info["health"]["consecutive_failures"] == 6
+    assert info["health"]["last_error"] == "ignore"
+
+
+def test_successful_probe_closes_circuit():
+    info = {"health": None}
+    record_failure("demo", info, "timeout")
+    record_failure("demo", info, "timeout")
+    assert circuit_state(info, after_circuit(info)) == "half_open"
+
+    record_success("demo", info)
+
+    assert info["health"] is None
+    assert circuit_state(info) == "closed"
+
+    # 恢复后重新从头累计失败次数
+    record_failure("demo", info, "timeout")
+    assert circuit_state(info) == "closed"
@@ -0,0 +1,75 @@
+import json
+import hashlib
+
+from core import packages_downloader, retry_queue
+from core.packages_downloader import PackagesDownloader
+
+FILES = {"demo-1.0.tar.gz": b"demo sdist", "demo-1.0-py3-none-any.whl": b"demo wheel"}
+
+
+def write_outdated_package(tmp_path):
+    """写入一个 1.0 版本待下载的包"""
+    releases = {
+        filename: {"url": f"https://files.pythonhosted.org/packages/{filename}",
+                   "sha256": hashlib.sha256(content).hexdigest()}
+        for filename, content in FILES.items()
+    }
+    packages_data = {"demo": {
+        "last_checked": None,
+        "check_interval": None,
+        "last_downloaded_version": "0.9",
+        "latest_version": "1.0",
+        "status": "outdated",
+        "latest_releases": {"1.0": releases},
+        "health": None,
+    }}
+    with open(tmp_path / "packages.json", "w", encoding="utf-8") as f:
+        json.dump(packages_data, f)
+
+
+def run_download(tmp_path) -> dict:
+    downloader = PackagesDownloader(str(tmp_path / "packages.json"), str(tmp_path / "packages"))
+    downloader.load_packages()
+    downloader.download_outdated_packages(retry_wait=0)
+    downloader.manifest.close()
+    with open(tmp_path / "packages.json", encoding="utf-8") as f:
+        return json.load(f)["demo"]
+
+
+def test_abandoned_file_is_downloaded_again_after_recovery(tmp_path, stub_server, monkeypatch):
+    server = stub_server()
+    server.routes["/packages/demo-1.0.tar.gz"] = (200, FILES["demo-1.0.tar.gz"])
+    server.routes["/packages/demo-1.0-py3-none-any.whl"] = (500, b"error")
+    monkeypatch.setattr(packages_downloader, "FILE_MIRROR_URLS", [server.url])
+    monkeypatch.setattr(retry_queue, "RETRY_MAX_ATTEMPTS", 1)  # 第一次失败即放弃
+    write_outdated_package(tmp_path)
+
+    info = run_download(tmp_path)
+
+    # 放弃后保持 outdated，版本停留在下载前，已下载的文件保留
+    assert info["status"] == "outdated"
+    assert info["last_downloaded_version"] == "0.9"
+    assert (tmp_path / "packages" / "demo" / "1.0" / "demo-1.0.tar.gz").read_bytes() == FILES["demo-1.0.tar.gz"]
+    assert not (tmp_path / "packages" / "demo" / "1.0" / "demo-1.0-py3-none-any.whl").exists()
+
+    # 上游恢复后再次运行，只下载之前失败的文件
+    server.routes["/packages/demo-1.0-py3-none-any.whl"] = (200, FILES["demo-1.0-py3-none-any.whl"])
+    info = run_download(tmp_path)
+
+    assert info["status"] == "up_to_date"
+    assert info["last_downloaded_version"] == "1.0"
+    assert (tmp_path / "packages" / "demo" / "1.0" / "demo-1.0-py3-none-any.whl").read_bytes() == \
+        FILES["demo-1.0-py3-none-any.whl"]
+    assert server.requests.count("/packages/demo-1.0.tar.gz") == 1
+
+
+def test_retry_pending_keeps_last_complete_version(tmp_path, stub_server, monkeypatch):
+    server = stub_server()
+    server.routes["/packages/demo-1.0.tar.gz"] = (200, FILES["demo-1.0.tar.gz"])
+    monkeypatch.setattr(packages_downloader, "FILE_MIRROR_URLS", [server.url])
+    write_outdated_package(tmp_path)
+
+    info = run_download(tmp_path)
+
+    assert info["status"] == "retry_pending"
+    assert info["last_downloaded_version"] == "0.9"
@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import subprocess
+
+from conftest import make_app, run_main, add_package, file_content
+from core.shard import ConsistentHashRing
+
+NUM_NODES = 2
+
+
+def pick_names(count_per_node: int):
+    """为每个节点挑选确定分配到该节点的包名"""
+    ring = ConsistentHashRing(NUM_NODES)
+    names = {node_id: [] for node_id in range(NUM_NODES)}
+    i = 0
+    while any(len(v) < count_per_node for v in names.values()):
+        name = f"pkg{i}"
+        if len(names[ring.node_for(name)]) < count_per_node:
+            names[ring.node_for(name)].append(name)
+        i += 1
+    return names
+
+
+def test_shards_as_processes_then_merge(tmp_path, stub_server):
+    server = stub_server()
+    app_dir = make_app(tmp_path, server.url)
+
+    names = pick_names(2)
+    good = [names[0][0], names[1][0]]
+    broken, missing = names[0][1], names[1][1]  # 文件下载失败 / PyPI 上不存在
+    files = {name: add_package(server, name)["1.0"] for name in good}
+    broken_file = add_package(server, broken, file_status=500)["1.0"]
+    with open(os.path.join(app_dir, "init_packages.json"), "w", encoding="utf-8") as f:
+        json.dump({name: None for name in good + [broken, missing]}, f)
+
+    # 每个分片作为独立进程并行运行
+    processes = [
+        subprocess.Popen([sys.executable, "main.py", "shard", f"{node_id}/{NUM_NODES}"], cwd=app_dir,
+                         stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8")
+        for node_id in range(NUM_NODES)
+    ]
+    for process in processes:
+        output, _ = process.communicate(timeout=120)
+        assert process.returncode == 0, output
+
+    # 分片只写自己的目录，不改动主状态
+    assert not os.path.exists(os.path.join(app_dir, "data", "packages.json"))
+    for node_id in range(NUM_NODES):
+        shard_dir = os.path.join(app_dir, "data", "shards", f"shard_{node_id}_of_{NUM_NODES}")
+        with open(os.path.join(shard_dir, "packages.json"), encoding="utf-8") as f:
+            assert set(json.load(f)) == set(names[node_id])
+
+    result = run_main(app_dir, "merge-shards", str(NUM_NODES))
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    with open(os.path.join(app_dir, "data", "packages.json"), encoding="utf-8") as f:
+        packages_data = json.load(f)
+    assert set(packages_data) == set(good + [broken, missing])
+    for name in good:
+        assert packages_data[name]["status"] == "up_to_date"
+        assert packages_data[name]["last_downloaded_version"] == "1.0"
+        path = os.path.join(app_dir, "data", "packages", name, "1.0", files[name])
+        with open(path, "rb") as f:
+            assert f.read() == file_content(name, "1.0")
+    assert packages_data[broken]["status"] == "retry_pending"
+    assert packages_data[missing]["status"] == "ignore"
+
+    with open(os.path.join(app_dir, "data", "retry_queue.json"), encoding="utf-8") as f:
+        retry_entries = json.load(f)
+    assert [(e["package"], e["filename"]) for e in retry_entries.values()] == [(broken, broken_file)]
+
+    # 合并后分片目录被删除
+    assert not os.listdir(os.path.join(app_dir, "data", "shards"))
+
+
+def test_invalid_shard_argument(tmp_path, stub_server):
+    app_dir = make_app(tmp_path, stub_server().url)
+    for spec in ("0-2", "2/2", "x/2", "0/0"):
+        result = run_main(app_dir, "shard", spec)
+        assert result.returncode == 2
+        assert "I/N" in result.stderr and "Traceback" not in result.stderr
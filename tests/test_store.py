@@ -0,0 +1,122 @@
+import os
+import json
+import hashlib
+import zipfile
+from datetime import datetime
+from urllib.parse import unquote
+
+from conftest import make_app, run_main, add_package, file_content
+
+
+def index_targets(app_dir: str, project: str) -> list:
+    """返回简单索引中项目页面的链接指向的本地文件"""
+    project_dir = os.path.join(app_dir, "data", "simple", project)
+    with open(os.path.join(project_dir, "index.json"), encoding="utf-8") as f:
+        page = json.load(f)
+    return [os.path.normpath(os.path.join(project_dir, unquote(item["url"]))) for item in page["files"]]
+
+
+def test_store_persists_across_runs(tmp_path, stub_server):
+    server = stub_server()
+    app_dir = make_app(tmp_path, server.url)
+    with open(os.path.join(app_dir, "init_packages.json"), "w", encoding="utf-8") as f:
+        json.dump({"demo": None}, f)
+
+    add_package(server, "demo", versions=("1.0",))
+    result = run_main(app_dir)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    # 发布新版本后再次运行（检查间隔未到期，强制检查）
+    files = add_package(server, "demo", versions=("1.0", "1.1"))
+    result = run_main(app_dir, "--force-check", "demo")
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    # 上一次运行下载的文件仍在包目录中，索引中的每个链接都指向存在的文件
+    targets = index_targets(app_dir, "demo")
+    assert len(targets) == 2
+    for version, filename in files.items():
+        path = os.path.join(app_dir, "data", "packages", "demo", version, filename)
+        assert os.path.normpath(path) in targets
+        with open(path, "rb") as f:
+            assert f.read() == file_content("demo", version)
+
+    # 当天的归档包含当天所有运行发布的文件
+    today = datetime.now().strftime("%Y-%m-%d")
+    with zipfile.ZipFile(os.path.join(app_dir, "data", "archives", f"packages_{today}.zip")) as zipf:
+        assert sorted(zipf.namelist()) == sorted(f"demo/{v}/{fn}" for v, fn in files.items())
+
+
+def test_retention_prunes_store_index_and_changefeed():
+    from core.packages_downloader import publish_downloaded_files, prune_store
+    from utils.changefeed import Changefeed
+    from utils.store_manifest import StoreManifest
+
+    def download(name: str) -> dict:
+        """模拟下载一个文件并写入清单"""
+        os.makedirs(os.path.join("data", "packages", name, "1.0"))
+        with open(os.path.join("data", "packages", name, "1.0", f"{name}-1.0.tar.gz"), "wb") as f:
+            f.write(file_content(name, "1.0"))
+        manifest = StoreManifest("data/packages")
+        manifest.add(name, "1.0", f"{name}-1.0.tar.gz", "")
+        manifest.close()
+        return {"package": name, "version": "1.0", "filename": f"{name}-1.0.tar.gz", "sha256": "", "size": 1}
+
+    old_run = publish_downloaded_files([download("old")])
+    # 将第一次运行改为两天前发布
+    manifest = StoreManifest("data/packages")
+    manifest.set_run_id(["old/1.0/old-1.0.tar.gz"], old_run, "2000-01-01")
+    manifest.close()
+    new_run = publish_downloaded_files([download("new")])
+
+    assert prune_store(retention_days=1) == 1
+    assert not os.path.exists(os.path.join("data", "packages", "old", "1.0", "old-1.0.tar.gz"))
+    assert os.path.exists(os.path.join("data", "packages", "new", "1.0", "new-1.0.tar.gz"))
+
+    # 索引不再指向已删除的文件
+    assert not os.path.exists(os.path.join("data", "simple", "old"))
+    with open(os.path.join("data", "simple", "index.json"), encoding="utf-8") as f:
+        assert [p["name"] for p in json.load(f)["projects"]] == ["new"]
+
+    # 变更流只返回仍在包目录中的文件
+    changefeed = Changefeed()
+    assert changefeed.load_state()["pruned_run_id"] == old_run
+    last_run_id, changes = changefeed.changes_since(0)
+    assert last_run_id == new_run
+    assert [c["path"] for c in changes] == ["new/1.0/new-1.0.tar.gz"]
+
+
+def test_new_manifest_backfills_existing_store():
+    from utils.store_manifest import StoreManifest
+
+    # 升级前的包目录中已有文件，但还没有清单
+    for version in ("1.0", "0.9"):
+        os.makedirs(os.path.join("data", "packages", "demo", version))
+        with open(os.path.join("data", "packages", "demo", version, f"demo-{version}.tar.gz"), "wb") as f:
+            f.write(file_content("demo", version))
+    sha256 = hashlib.sha256(file_content("demo", "1.0")).hexdigest()
+    with open(os.path.join("data", "packages.json"), "w", encoding="utf-8") as f:
+        json.dump({"demo": {"latest_releases": {"1.0": {"demo-1.0.tar.gz": {"url": "", "sha256": sha256}}}}}, f)
+
+    manifest = StoreManifest("data/packages")
+    try:
+        rows = {row["path"]: row for row in manifest.rows()}
+        assert sorted(rows) == ["demo/0.9/demo-0.9.tar.gz", "demo/1.0/demo-1.0.tar.gz"]
+        assert rows["demo/1.0/demo-1.0.tar.gz"]["sha256"] == sha256
+        assert rows["demo/0.9/demo-0.9.tar.gz"]["sha256"] is None
+        assert rows["demo/1.0/demo-1.0.tar.gz"]["run_id"] is None
+        # 已有的文件不需要重新下载，清理时也能按清单删除
+        assert manifest.contains("demo", "1.0", "demo-1.0.tar.gz", sha256)
+        assert manifest.clear_files() == 2
+        assert manifest.stats()[0] == 0
+    finally:
+        manifest.close()
+
+    # 已有清单时不再遍历目录
+    os.makedirs(os.path.join("data", "packages", "other", "1.0"))
+    with open(os.path.join("data", "packages", "other", "1.0", "other-1.0.tar.gz"), "wb") as f:
+        f.write(b"other")
+    manifest = StoreManifest("data/packages")
+    try:
+        assert manifest.rows() == []
+    finally:
+        manifest.close()
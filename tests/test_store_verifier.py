@@ -0,0 +1,139 @@
+import os
+import json
+import hashlib
+import zipfile
+from datetime import datetime
+
+from conftest import file_content
+from core import packages_downloader
+from core.packages_downloader import publish_downloaded_files
+from core.retry_queue import RetryQueue, RETRY_QUEUE_PATH
+from utils.archive_generator import ArchiveGenerator
+from utils.store_manifest import StoreManifest
+from utils import store_verifier
+
+
+def store_file(name: str, version: str = "1.0") -> dict:
+    """模拟下载器写入一个文件并记录到清单，返回下载记录"""
+    filename = f"{name}-{version}.tar.gz"
+    content = file_content(name, version)
+    os.makedirs(os.path.join("data", "packages", name, version), exist_ok=True)
+    with open(os.path.join("data", "packages", name, version, filename), "wb") as f:
+        f.write(content)
+    sha256 = hashlib.sha256(content).hexdigest()
+    manifest = StoreManifest("data/packages")
+    manifest.add(name, version, filename, sha256)
+    manifest.close()
+    return {"package": name, "version": version, "filename": filename, "sha256": sha256, "size": len(content)}
+
+
+def write_packages_json(records: list):
+    packages_data = {}
+    for record in records:
+        info = packages_data.setdefault(record["package"], {
+            "last_downloaded_version": record["version"],
+            "latest_version": record["version"],
+            "status": "up_to_date",
+            "latest_releases": {},
+        })
+        url = f"https://files.pythonhosted.org/packages/{record['filename']}"
+        info["latest_releases"].setdefault(record["version"], {})[record["filename"]] = {
+            "url": url, "sha256": record["sha256"]}
+    with open(os.path.join("data", "packages.json"), "w", encoding="utf-8") as f:
+        json.dump(packages_data, f)
+
+
+def index_files(project: str) -> list:
+    json_path = os.path.join("data", "simple", project, "index.json")
+    if not os.path.isfile(json_path):
+        return []
+    with open(json_path, encoding="utf-8") as f:
+        return [item["filename"] for item in json.load(f)["files"]]
+
+
+def archive_names() -> list:
+    today = datetime.now().strftime("%Y-%m-%d")
+    with zipfile.ZipFile(os.path.join("data", "archives", f"packages_{today}.zip")) as zipf:
+        return sorted(zipf.namelist())
+
+
+def test_verify_then_archive_skips_corrupt_file():
+    records = [store_file("good"), store_file("bad")]
+    write_packages_json(records)
+    publish_downloaded_files(records)
+    with open(os.path.join("data", "packages", "bad", "1.0", "bad-1.0.tar.gz"), "wb") as f:
+        f.write(b"corrupted")
+
+    assert store_verifier.main() is False
+
+    # 损坏文件被删除并从清单中移除，之后的归档不再引用它
+    manifest = StoreManifest("data/packages")
+    assert manifest.paths() == ["good/1.0/good-1.0.tar.gz"]
+    manifest.close()
+    ArchiveGenerator().create_daily_archive()
+    assert archive_names() == ["good/1.0/good-1.0.tar.gz"]
+
+    retry_queue = RetryQueue(RETRY_QUEUE_PATH)
+    retry_queue.load()
+    assert retry_queue.has_package("bad") and not retry_queue.has_package("good")
+
+
+def test_archive_skips_manifest_rows_without_file():
+    records = [store_file("kept"), store_file("gone")]
+    publish_downloaded_files(records)
+    os.remove(os.path.join("data", "packages", "gone", "1.0", "gone-1.0.tar.gz"))
+
+    ArchiveGenerator().create_daily_archive()
+
+    assert archive_names() == ["kept/1.0/kept-1.0.tar.gz"]
+
+
+def test_verify_checks_only_stored_files():
+    # 重试下载的文件单独出现在包目录中，同版本的其他文件不在本地
+    sibling = {"package": "demo", "version": "1.0", "filename": "demo-1.0-py3-none-any.whl", "sha256": "0" * 64}
+    retried = store_file("demo")
+    write_packages_json([retried, sibling])
+
+    assert store_verifier.main() is True
+    retry_queue = RetryQueue(RETRY_QUEUE_PATH)
+    retry_queue.load()
+    assert len(retry_queue) == 0
+
+
+def test_corrupt_file_without_known_url_is_dropped_from_index():
+    old = store_file("demo", "0.9")
+    current = store_file("demo", "1.0")
+    write_packages_json([current])  # 0.9 已不在 latest_releases 中
+    publish_downloaded_files([old, current])
+    with open(os.path.join("data", "packages", "demo", "0.9", "demo-0.9.tar.gz"), "wb") as f:
+        f.write(b"corrupted")
+
+    assert store_verifier.main() is False
+
+    assert not os.path.exists(os.path.join("data", "packages", "demo", "0.9", "demo-0.9.tar.gz"))
+    assert index_files("demo") == ["demo-1.0.tar.gz"]
+    retry_queue = RetryQueue(RETRY_QUEUE_PATH)
+    retry_queue.load()
+    assert len(retry_queue) == 0
+
+
+def test_requeued_file_leaves_index_until_downloaded_again(stub_server, monkeypatch):
+    server = stub_server()
+    monkeypatch.setattr(packages_downloader, "FILE_MIRROR_URLS", [server.url])
+    records = [store_file("demo", "1.0")]
+    write_packages_json(records)
+    publish_downloaded_files(records)
+    with open(os.path.join("data", "packages", "demo", "1.0", "demo-1.0.tar.gz"), "wb") as f:
+        f.write(b"corrupted")
+
+    assert store_verifier.main() is False
+
+    # 等待重新下载期间，索引中不再有指向已删除文件的链接
+    assert index_files("demo") == []
+
+    server.routes["/packages/demo-1.0.tar.gz"] = (200, file_content("demo", "1.0"))
+    packages_downloader.main().manifest.close()
+
+    assert index_files("demo") == ["demo-1.0.tar.gz"]
+    with open(os.path.join("data", "packages", "demo", "1.0", "demo-1.0.tar.gz"), "rb") as f:
+        assert f.read() == file_content("demo", "1.0")
@@ -4,12 +4,13 @@ from datetime import datetime
 from pathlib import Path
 from typing import List, Optional
 from utils.logger import log
+from utils.store_manifest import StoreManifest, has_manifest
 
 
 class ArchiveGenerator:
     """
     压缩文件生成器：
-    - 收集每日下载文件
+    - 收集每日下载文件（包目录持久保存，只打包当天发布的文件）
     - 生成按日期命名的压缩包
     - 验证压缩文件完整性
     - 清理旧归档
@@ -20,21 +21,47 @@ class ArchiveGenerator:
         self.archives_dir = archives_dir 
 
 
+    def collect_files(self, date_str: str) -> List[tuple]:
+        """
+        返回 [(文件路径, zip 中的相对路径), ...]
+        优先读取包目录清单中该日期发布的文件，没有清单时遍历整个目录
+        """
+        if has_manifest(self.packages_dir):
+            manifest = StoreManifest(self.packages_dir)
+            try:
+                return [(manifest.full_path(rel_path), rel_path) for rel_path in manifest.paths_for_date(date_str)]
+            finally:
+                manifest.close()
+
+        files = []
+        # 遍历 data 文件夹中的所有文件和子文件夹
+        for root, dirs, filenames in os.walk(self.packages_dir):
+            for file in filenames:
+                file_path = Path(root) / file
+                # 计算在 zip 文件中的相对路径
+                files.append((file_path, file_path.relative_to(self.packages_dir)))
+        return files
+
     # 创建每日压缩包
-    def create_daily_archive(self) -> Optional[Path]:
-        today_str = datetime.now().strftime("%Y-%m-%d")
+    def create_daily_archive(self, date_str: Optional[str] = None) -> Optional[Path]:
+        """
+        Args:
+            date_str: 归档日期 YYYY-MM-DD，默认为今天（常驻进程跨天时归档前一天发布的文件）
+        """
+        today_str = date_str or datetime.now().strftime("%Y-%m-%d")
         archive_name = f"packages_{today_str}.zip"
+        os.makedirs(self.archives_dir, exist_ok=True)
         archive_path = Path(self.archives_dir) / archive_name
         # try:
         with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # 遍历 data 文件夹中的所有文件和子文件夹
-            for root, dirs, files in os.walk(self.packages_dir):
-                for file in files:
-                    file_path = Path(root) / file
-                    # 计算在 zip 文件中的相对路径
-                    arcname = file_path.relative_to(self.packages_dir)
+            for file_path, arcname in self.collect_files(today_str):
+                try:
                     zipf.write(file_path, arcname)
-                    log.debug(f"已添加: {arcname}")
+                except FileNotFoundError:
+                    # 清单记录的文件已不存在（例如被手动删除），跳过而不中断整个归档
+                    log.warning(f"文件不存在，跳过: {arcname}")
+                    continue
+                log.debug(f"已添加: {arcname}")
         
         log.info(f"压缩完成: {self.archives_dir}")
         log.info(f"压缩文件大小: {archive_path.stat().st_size / 1024 / 1024:.2f} MB")
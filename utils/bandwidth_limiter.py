@@ -0,0 +1,126 @@
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+from utils.logger import log
+
+
+def parse_schedule(schedule: List[Tuple[str, str, int]]) -> List[Tuple[int, int, int]]:
+    """
+    将 [("08:00", "20:00", 字节/秒), ...] 解析为 [(开始分钟, 结束分钟, 字节/秒), ...]
+    """
+    parsed = []
+    for start, end, rate in schedule:
+        start_h, start_m = (int(x) for x in start.split(":"))
+        end_h, end_m = (int(x) for x in end.split(":"))
+        parsed.append((start_h * 60 + start_m, end_h * 60 + end_m, int(rate)))
+    return parsed
+
+
+class BandwidthLimiter:
+    """
+    全局令牌桶限速器，所有下载线程共享同一个桶：
+    - 速率为 0 表示不限速
+    - 支持按时间段切换速率（如白天限速、夜间全速）
+    - 令牌由所有线程共同消耗，空闲线程让出的带宽自动被活跃线程使用
+    """
+
+    def __init__(self, rate: int = 0, schedule: Optional[List[Tuple[str, str, int]]] = None, burst_seconds: float = 1.0):
+        """
+        Args:
+            rate: 默认速率（字节/秒），0 表示不限速
+            schedule: 时间段速率表 [("08:00", "20:00", 字节/秒), ...]，命中时段时覆盖默认速率
+            burst_seconds: 桶容量对应的秒数，允许短时突发
+        """
+        self.default_rate = int(rate)
+        self.schedule = parse_schedule(schedule or [])
+        self.burst_seconds = burst_seconds
+        self.lock = threading.Lock()
+
+        self.rate = self.current_rate()
+        self.tokens = self.rate * self.burst_seconds
+        self.last_refill = time.monotonic()
+
+        # 统计信息
+        self.start_time = self.last_refill
+        self.consumed_bytes = 0
+        self.limited_bytes = 0  # 限速时段内消耗的字节数
+        self.budget_bytes = 0.0  # 限速时段内的预算字节数
+        self.unlimited_seconds = 0.0  # 处于不限速时段的时长
+
+    def current_rate(self, now: Optional[datetime] = None) -> int:
+        """根据当前时间返回生效的速率（字节/秒）"""
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        for start, end, rate in self.schedule:
+            if start <= end:
+                hit = start <= minute < end
+            else:  # 跨越午夜的时段，如 22:00 - 06:00
+                hit = minute >= start or minute < end
+            if hit:
+                return rate
+        return self.default_rate
+
+    def _refill(self):
+        """补充令牌并累计预算（调用方需持有锁）"""
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+
+        if self.rate > 0:
+            self.budget_bytes += elapsed * self.rate
+        else:
+            self.unlimited_seconds += elapsed
+
+        rate = self.current_rate()
+        if rate != self.rate:
+            log.info(f"下载限速切换: {format_rate(self.rate)} -> {format_rate(rate)}")
+            self.rate = rate
+            self.tokens = min(self.tokens, rate * self.burst_seconds)
+
+        if self.rate > 0:
+            self.tokens = min(self.rate * self.burst_seconds, self.tokens + elapsed * self.rate)
+
+    def consume(self, nbytes: int):
+        """
+        消耗 nbytes 个令牌，令牌不足时阻塞等待。
+        令牌允许透支，透支部分由当前线程睡眠偿还，保证整体速率不超过预算。
+        """
+        with self.lock:
+            self._refill()
+            self.consumed_bytes += nbytes
+            if self.rate <= 0:
+                return
+            self.limited_bytes += nbytes
+            self.tokens -= nbytes
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def report(self):
+        """输出实际吞吐量与预算吞吐量对比"""
+        with self.lock:
+            self._refill()
+            elapsed = self.last_refill - self.start_time
+            consumed = self.consumed_bytes
+            limited_bytes = self.limited_bytes
+            budget = self.budget_bytes
+            unlimited = self.unlimited_seconds
+
+        actual_rate = consumed / elapsed if elapsed > 0 else 0
+        log.info(f"下载流量: {consumed / 1024 / 1024:.2f} MB，耗时 {elapsed:.2f} 秒，实际吞吐 {format_rate(actual_rate)}")
+        if budget > 0:
+            limited = elapsed - unlimited
+            budget_rate = budget / limited if limited > 0 else 0
+            log.info(f"限速预算: {format_rate(budget_rate)}，预算利用率 {min(limited_bytes / budget, 1.0) * 100:.1f}%"
+                     + (f"（其中 {unlimited:.2f} 秒处于不限速时段）" if unlimited > 0 else ""))
+        else:
+            log.info("限速预算: 不限速")
+
+
+def format_rate(rate: float) -> str:
+    """格式化速率显示"""
+    if rate <= 0:
+        return "不限速"
+    return f"{rate / 1024 / 1024:.2f} MB/s"
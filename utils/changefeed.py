@@ -0,0 +1,125 @@
+import os
+import json
+from datetime import datetime
+from typing import Dict, List, Tuple
+from utils.logger import log
+
+CHANGEFEED_PATH = "data/changefeed.jsonl"
+CHANGEFEED_STATE_PATH = "data/changefeed_state.json"
+
+"""
+变更流（changefeed）：每次运行向 data/changefeed.jsonl 追加本次新增的文件，每行一条：
+{"run_id": 12, "time": "2025-10-01T03:10:00", "package": "requests", "version": "2.32.5",
+ "filename": "requests-2.32.5-py3-none-any.whl", "path": "requests/2.32.5/requests-2.32.5-py3-none-any.whl",
+ "sha256": "...", "size": 64738}
+
+data/changefeed_state.json 记录最新的 run_id、文件有效长度和每次运行的起始偏移，
+下游只需记住自己同步到的 run_id，通过 changes_since(run_id) 获取之后新增的文件，
+读取时直接定位到对应偏移，不需要扫描整个变更流或包目录。
+
+包目录按保留策略（STORE_RETENTION_DAYS）清理旧运行的文件后，pruned_run_id 记录已清理的最大 run_id，
+changes_since 不再返回这些运行的文件；落后超过保留期的下游需要从每日归档重新同步。
+"""
+
+
+class Changefeed:
+    """只追加的变更流，按单调递增的 run_id 分组"""
+
+    def __init__(self, path: str = CHANGEFEED_PATH, state_path: str = CHANGEFEED_STATE_PATH):
+        self.path = path
+        self.state_path = state_path
+
+    def load_state(self) -> Dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"last_run_id": 0, "end_offset": 0, "offsets": {}, "pruned_run_id": 0}
+
+    def save_state(self, state: Dict):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def append_run(self, records: List[Dict]) -> int:
+        """
+        以新的 run_id 追加本次运行新增的文件
+
+        Args:
+            records: [{"package", "version", "filename", "sha256", "size"}, ...]
+
+        Returns:
+            本次运行的 run_id
+        """
+        state = self.load_state()
+        run_id = state["last_run_id"] + 1
+        now = datetime.now().isoformat()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'ab') as f:
+            # 丢弃上次运行中途退出时写了一半、未记录到状态文件中的内容
+            f.truncate(state["end_offset"])
+            f.seek(state["end_offset"])
+            for record in records:
+                line = {
+                    "run_id": run_id,
+                    "time": now,
+                    "package": record["package"],
+                    "version": record["version"],
+                    "filename": record["filename"],
+                    "path": "/".join((record["package"], record["version"], record["filename"])),
+                    "sha256": record["sha256"],
+                    "size": record.get("size"),
+                }
+                f.write((json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            end_offset = f.tell()
+
+        state["offsets"][str(run_id)] = state["end_offset"]
+        state["last_run_id"] = run_id
+        state["end_offset"] = end_offset
+        self.save_state(state)
+
+        log.info(f"变更流已追加: run_id {run_id}，{len(records)} 个文件")
+        return run_id
+
+    def mark_pruned(self, run_id: int):
+        """记录 run_id 及之前运行的文件已从包目录清理"""
+        state = self.load_state()
+        if run_id > state.get("pruned_run_id", 0):
+            state["pruned_run_id"] = run_id
+            self.save_state(state)
+            log.info(f"变更流: run_id {run_id} 及之前的文件已从包目录清理")
+
+    def changes_since(self, run_id: int) -> Tuple[int, List[Dict]]:
+        """
+        返回 run_id 之后（不含）所有运行新增、且仍保存在包目录中的文件
+
+        Returns:
+            (最新的 run_id, 变更记录列表)
+        """
+        state = self.load_state()
+        last_run_id = state["last_run_id"]
+        if run_id >= last_run_id:
+            return last_run_id, []
+
+        pruned_run_id = state.get("pruned_run_id", 0)
+        if run_id < pruned_run_id:
+            # 已清理运行的文件不再返回，调用方根据 pruned_run_id 从每日归档同步
+            run_id = pruned_run_id
+            if run_id >= last_run_id:
+                return last_run_id, []
+
+        start_offset = state["offsets"].get(str(run_id + 1), 0) if run_id >= 0 else 0
+        changes = []
+        with open(self.path, 'rb') as f:
+            f.seek(start_offset)
+            data = f.read(state["end_offset"] - start_offset)
+        for line in data.decode("utf-8").splitlines():
+            if line:
+                record = json.loads(line)
+                if record["run_id"] > run_id:
+                    changes.append(record)
+        return last_run_id, changes
@@ -0,0 +1,32 @@
+import os
+import mmap
+import hashlib
+from typing import Tuple
+
+HASH_BLOCK_SIZE = 1024 * 1024  # 大块读取，减少系统调用次数
+
+
+def calc_sha256(path: str, block_size: int = HASH_BLOCK_SIZE) -> str:
+    """
+    计算文件的SHA256
+    优先使用内存映射，无法映射时（如空文件）退回到大块读取
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size > 0:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    for offset in range(0, len(m), block_size):
+                        h.update(m[offset:offset + block_size])
+                return h.hexdigest()
+            except (OSError, ValueError):
+                f.seek(0)
+        for chunk in iter(lambda: f.read(block_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_file_with_stat(path: str) -> Tuple[str, int, int, str]:
+    """计算文件哈希并返回 (路径, 大小, 修改时间, sha256)，供进程池调用"""
+    stat = os.stat(path)
+    return path, stat.st_size, stat.st_mtime_ns, calc_sha256(path)
@@ -5,10 +5,12 @@ import os
 
 DEFAULT_PACKAGE_TEMPLATE = {
     "last_checked": None,
+    "check_interval": None,
     "last_downloaded_version": None, 
     "latest_version": None,
     "status" : None,
-    "latest_releases":{}
+    "latest_releases":{},
+    "health": None
 }
 
 def initialize_packages(input_json_path: str = "init_packages.json") -> bool:
@@ -1,4 +1,5 @@
 import os
+import threading
 from datetime import datetime
 from config import DEBUG_MODE
 
@@ -76,4 +77,23 @@ class logger():
         else:
             print(f"无效的日志级别: {level}")
 
-log = logger()
+class LazyLogger():
+    """
+    延迟创建的日志器：首次写日志时才创建日志文件
+    避免导入模块即产生日志文件，只查询状态的命令不会创建日志
+    """
+    def __init__(self):
+        self._logger = None
+        self._lock = threading.Lock()
+
+    def _get_logger(self):
+        if self._logger is None:
+            with self._lock:
+                if self._logger is None:
+                    self._logger = logger()
+        return self._logger
+
+    def __getattr__(self, name):
+        return getattr(self._get_logger(), name)
+
+log = LazyLogger()
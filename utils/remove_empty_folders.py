@@ -1,5 +1,6 @@
 import os
 from utils.logger import log
+from utils.store_manifest import StoreManifest, has_manifest
 
 def remove_empty_folders_simple(folder_path: str = "data/packages") -> int:
     """
@@ -18,3 +19,21 @@ def remove_empty_folders_simple(folder_path: str = "data/packages") -> int:
                 pass  # 删除失败
     log.info(f"共删除了 {count} 个空文件夹")
     return count
+
+
+def remove_empty_folders_touched(folder_path: str = "data/packages") -> int:
+    """
+    只检查清单中记录的本次运行有变动的目录，删除其中的空文件夹
+    没有清单时退回到遍历整个目录
+    返回删除的文件夹数量
+    """
+    if not has_manifest(folder_path):
+        return remove_empty_folders_simple(folder_path)
+
+    manifest = StoreManifest(folder_path)
+    try:
+        count = manifest.prune_touched_dirs()
+    finally:
+        manifest.close()
+    log.info(f"共删除了 {count} 个空文件夹")
+    return count
@@ -0,0 +1,196 @@
+import os
+import re
+import json
+import html
+import shutil
+from collections import defaultdict
+from urllib.parse import quote
+from typing import Dict, List
+from utils.logger import log
+
+API_VERSION = "1.0"
+
+"""
+简单索引目录结构（PEP 503 / PEP 691）：
+data/simple/
+    index.html          所有项目列表
+    index.json
+    <project>/
+        index.html      项目文件列表，链接带 #sha256= 片段
+        index.json      同时作为增量更新时的项目状态
+
+使用方式：pip install --index-url file:///path/to/data/simple <package>
+"""
+
+
+def normalize_name(name: str) -> str:
+    """PEP 503 项目名规范化"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _write_atomic(path: str, content: str):
+    """先写临时文件再替换，避免读取方看到写了一半的页面"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class SimpleIndexGenerator:
+    """
+    简单索引生成器：
+    - 只更新本次运行涉及的项目页面，不重新生成全部索引
+    - 只有出现新项目或项目被清空时才改写根页面
+    - 包目录按保留策略清理文件时，同步移除对应的链接
+    """
+
+    def __init__(self, index_dir: str = "data/simple", packages_dir: str = "data/packages"):
+        self.index_dir = index_dir
+        self.packages_dir = packages_dir
+
+    def update(self, records: List[Dict]) -> int:
+        """
+        根据本次下载的文件记录增量更新索引
+
+        Args:
+            records: [{"package", "version", "filename", "sha256"}, ...]
+
+        Returns:
+            更新的项目页面数量
+        """
+        if not records:
+            log.info("没有新下载的文件，简单索引无需更新")
+            return 0
+
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        by_project = defaultdict(list)
+        for record in records:
+            by_project[normalize_name(record["package"])].append(record)
+
+        new_projects = []
+        for project, project_records in by_project.items():
+            if not os.path.isdir(os.path.join(self.index_dir, project)):
+                new_projects.append(project)
+            self.update_project(project, project_records)
+
+        if new_projects:
+            self.update_root(new_projects)
+
+        log.info(f"简单索引已更新: {len(by_project)} 个项目页面，新增 {len(new_projects)} 个项目")
+        return len(by_project)
+
+    def remove(self, records: List[Dict]) -> int:
+        """
+        从索引中移除已从包目录删除的文件，没有文件的项目从根页面中移除
+
+        Returns:
+            更新的项目页面数量
+        """
+        by_project = defaultdict(set)
+        for record in records:
+            by_project[normalize_name(record["package"])].add(record["filename"])
+
+        empty_projects = []
+        for project, filenames in by_project.items():
+            json_path = os.path.join(self.index_dir, project, "index.json")
+            if not os.path.isfile(json_path):
+                continue
+            with open(json_path, "r", encoding="utf-8") as f:
+                page = json.load(f)
+            page["files"] = [item for item in page["files"] if item["filename"] not in filenames]
+            if page["files"]:
+                _write_atomic(json_path, json.dumps(page, indent=2, ensure_ascii=False))
+                _write_atomic(os.path.join(self.index_dir, project, "index.html"), self.render_project_html(page))
+            else:
+                shutil.rmtree(os.path.join(self.index_dir, project))
+                empty_projects.append(project)
+
+        if empty_projects:
+            self.update_root([], removed_projects=empty_projects)
+
+        log.info(f"简单索引已移除 {len(records)} 个文件，涉及 {len(by_project)} 个项目，移除 {len(empty_projects)} 个项目")
+        return len(by_project)
+
+    def update_project(self, project: str, records: List[Dict]):
+        """将新文件合并进单个项目的页面"""
+        project_dir = os.path.join(self.index_dir, project)
+        os.makedirs(project_dir, exist_ok=True)
+        json_path = os.path.join(project_dir, "index.json")
+
+        files = {}
+        if os.path.isfile(json_path):
+            with open(json_path, "r", encoding="utf-8") as f:
+                files = {item["filename"]: item for item in json.load(f)["files"]}
+
+        for record in records:
+            file_path = os.path.join(self.packages_dir, record["package"], record["version"], record["filename"])
+            url = os.path.relpath(file_path, project_dir).replace(os.sep, "/")
+            files[record["filename"]] = {
+                "filename": record["filename"],
+                "url": quote(url),
+                "hashes": {"sha256": record["sha256"]} if record["sha256"] else {},
+            }
+
+        page = {
+            "meta": {"api-version": API_VERSION},
+            "name": project,
+            "files": sorted(files.values(), key=lambda item: item["filename"]),
+        }
+        _write_atomic(json_path, json.dumps(page, indent=2, ensure_ascii=False))
+        _write_atomic(os.path.join(project_dir, "index.html"), self.render_project_html(page))
+
+    def update_root(self, new_projects: List[str], removed_projects: List[str] = ()):
+        """将新项目加入根页面，并移除已清空的项目"""
+        json_path = os.path.join(self.index_dir, "index.json")
+
+        projects = set()
+        if os.path.isfile(json_path):
+            with open(json_path, "r", encoding="utf-8") as f:
+                projects = {item["name"] for item in json.load(f)["projects"]}
+        projects.update(new_projects)
+        projects.difference_update(removed_projects)
+
+        page = {
+            "meta": {"api-version": API_VERSION},
+            "projects": [{"name": name} for name in sorted(projects)],
+        }
+        _write_atomic(json_path, json.dumps(page, indent=2, ensure_ascii=False))
+        _write_atomic(os.path.join(self.index_dir, "index.html"), self.render_root_html(page))
+
+    @staticmethod
+    def render_project_html(page: Dict) -> str:
+        lines = [
+            "<!DOCTYPE html>",
+            "<html>",
+            "<head>",
+            f'<meta name="pypi:repository-version" content="{API_VERSION}">',
+            f"<title>Links for {html.escape(page['name'])}</title>",
+            "</head>",
+            "<body>",
+            f"<h1>Links for {html.escape(page['name'])}</h1>",
+        ]
+        for item in page["files"]:
+            href = item["url"]
+            if "sha256" in item["hashes"]:
+                href += f"#sha256={item['hashes']['sha256']}"
+            lines.append(f'<a href="{html.escape(href)}">{html.escape(item["filename"])}</a><br/>')
+        lines += ["</body>", "</html>", ""]
+        return "\n".join(lines)
+
+    @staticmethod
+    def render_root_html(page: Dict) -> str:
+        lines = [
+            "<!DOCTYPE html>",
+            "<html>",
+            "<head>",
+            f'<meta name="pypi:repository-version" content="{API_VERSION}">',
+            "<title>Simple index</title>",
+            "</head>",
+            "<body>",
+        ]
+        for item in page["projects"]:
+            name = html.escape(item["name"])
+            lines.append(f'<a href="{name}/">{name}</a><br/>')
+        lines += ["</body>", "</html>", ""]
+        return "\n".join(lines)
@@ -0,0 +1,283 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from utils.logger import log
+
+"""
+包目录清单：记录包目录中每个文件的路径、大小、sha256、修改时间和 run_id
+下载、删除文件时同步更新，清理、归档和状态查询直接读取清单，不再遍历包目录
+
+清单保存在包目录的上一级目录中（data/packages -> data/manifest.db），
+touched_dirs 表记录本次运行中有文件写入或删除的目录，清理空目录时只检查这些目录，
+runs 表记录每个 run_id 的发布日期，每日归档只打包当天发布的文件
+在已有文件的包目录上新建清单时，先遍历一次目录补充已有文件的记录
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    package TEXT NOT NULL,
+    version TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER,
+    sha256 TEXT,
+    mtime_ns INTEGER,
+    run_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS touched_dirs (
+    path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL
+);
+"""
+
+
+def manifest_path_for(packages_dir: str) -> str:
+    """返回包目录对应的清单文件路径"""
+    return os.path.join(os.path.dirname(os.path.normpath(packages_dir)), "manifest.db")
+
+
+def has_manifest(packages_dir: str) -> bool:
+    """包目录是否已有清单（没有清单时调用方退回到遍历目录）"""
+    return os.path.isfile(manifest_path_for(packages_dir))
+
+
+def known_sha256(json_path: str) -> Dict[str, str]:
+    """从 packages.json 的 latest_releases 中读取已知文件的 sha256，返回 相对路径 -> sha256"""
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            packages_data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    hashes = {}
+    for package_name, info in packages_data.items():
+        for version, files in ((info or {}).get("latest_releases") or {}).items():
+            for filename, file_info in files.items():
+                if file_info.get("sha256"):
+                    hashes[StoreManifest.make_path(package_name, version, filename)] = file_info["sha256"]
+    return hashes
+
+
+class StoreManifest:
+    """包目录清单（线程安全）"""
+
+    def __init__(self, packages_dir: str = "data/packages", db_path: Optional[str] = None):
+        self.packages_dir = packages_dir
+        self.db_path = db_path or manifest_path_for(packages_dir)
+        self.lock = threading.Lock()
+        self.is_new = not os.path.isfile(self.db_path)
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        # 新建的清单不了解包目录中已有的文件，sha256 取自同一数据目录下的 packages.json
+        if self.is_new and os.path.isdir(self.packages_dir):
+            self.backfill(known_sha256(os.path.join(os.path.dirname(self.db_path), "packages.json")))
+
+    @staticmethod
+    def make_path(package_name: str, version: str, filename: str) -> str:
+        """清单中的相对路径，统一使用 / 分隔"""
+        return "/".join((package_name, version, filename))
+
+    def full_path(self, rel_path: str) -> str:
+        return os.path.join(self.packages_dir, *rel_path.split("/"))
+
+    def _touch(self, rel_path: str):
+        """记录文件所在目录（调用方需持有锁）"""
+        self.conn.execute("INSERT OR IGNORE INTO touched_dirs (path) VALUES (?)", (rel_path.rsplit("/", 1)[0],))
+
+    def add(self, package_name: str, version: str, filename: str, sha256: str, run_id: Optional[int] = None):
+        """记录新写入的文件，大小和修改时间从文件读取"""
+        rel_path = self.make_path(package_name, version, filename)
+        stat = os.stat(self.full_path(rel_path))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, package, version, filename, size, sha256, mtime_ns, run_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (rel_path, package_name, version, filename, stat.st_size, sha256, stat.st_mtime_ns, run_id),
+            )
+            self._touch(rel_path)
+            self.conn.commit()
+
+    def add_rows(self, rows: Iterable[Dict]):
+        """批量写入其他清单中的记录（合并分片时使用）"""
+        with self.lock:
+            for row in rows:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO files (path, package, version, filename, size, sha256, mtime_ns, run_id) "
+                    "VALUES (:path, :package, :version, :filename, :size, :sha256, :mtime_ns, :run_id)",
+                    row,
+                )
+                self._touch(row["path"])
+            self.conn.commit()
+
+    def backfill(self, hashes: Optional[Dict[str, str]] = None) -> int:
+        """
+        遍历一次包目录，为清单中没有记录的文件补充记录，返回补充的文件数
+        sha256 取自 hashes（相对路径 -> sha256），未知时为空；补充的文件不属于任何 run_id
+        """
+        hashes = hashes or {}
+        with self.lock:
+            recorded = {row[0] for row in self.conn.execute("SELECT path FROM files")}
+
+        rows = []
+        for root, dirs, files in os.walk(self.packages_dir):
+            for filename in files:
+                full_path = os.path.join(root, filename)
+                rel_path = os.path.relpath(full_path, self.packages_dir).replace(os.sep, "/")
+                parts = rel_path.split("/")
+                if len(parts) != 3 or rel_path in recorded:
+                    continue
+                stat = os.stat(full_path)
+                rows.append((rel_path, parts[0], parts[1], parts[2], stat.st_size, hashes.get(rel_path),
+                             stat.st_mtime_ns, None))
+
+        if rows:
+            with self.lock:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO files (path, package, version, filename, size, sha256, mtime_ns, run_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self.conn.commit()
+            log.info(f"清单已补充包目录中已有的 {len(rows)} 个文件")
+        return len(rows)
+
+    def contains(self, package_name: str, version: str, filename: str, sha256: str) -> bool:
+        """文件是否已记录在清单中且哈希一致（并确认文件仍存在）"""
+        rel_path = self.make_path(package_name, version, filename)
+        with self.lock:
+            row = self.conn.execute("SELECT sha256 FROM files WHERE path = ?", (rel_path,)).fetchone()
+        if not row or (row[0] or "").lower() != (sha256 or "").lower():
+            return False
+        return os.path.isfile(self.full_path(rel_path))
+
+    def remove(self, package_name: str, version: str, filename: str):
+        """记录被删除的文件"""
+        rel_path = self.make_path(package_name, version, filename)
+        with self.lock:
+            self.conn.execute("DELETE FROM files WHERE path = ?", (rel_path,))
+            self._touch(rel_path)
+            self.conn.commit()
+
+    def set_run_id(self, paths: List[str], run_id: int, date_str: Optional[str] = None):
+        """发布后回填文件所属的 run_id，并记录该次运行的发布日期（默认为今天）"""
+        date_str = date_str or datetime.now().strftime("%Y-%m-%d")
+        with self.lock:
+            self.conn.executemany("UPDATE files SET run_id = ? WHERE path = ?", [(run_id, p) for p in paths])
+            self.conn.execute("INSERT OR REPLACE INTO runs (run_id, date) VALUES (?, ?)", (run_id, date_str))
+            self.conn.commit()
+
+    def rows(self) -> List[Dict]:
+        with self.lock:
+            cursor = self.conn.execute(
+                "SELECT path, package, version, filename, size, sha256, mtime_ns, run_id FROM files ORDER BY path"
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def paths(self) -> List[str]:
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT path FROM files ORDER BY path")]
+
+    def paths_for_date(self, date_str: str) -> List[str]:
+        """返回指定日期发布的文件"""
+        with self.lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT path FROM files JOIN runs USING (run_id) WHERE runs.date = ? ORDER BY path", (date_str,)
+            )]
+
+    def prune_runs_before(self, date_str: str) -> Tuple[List[Dict], Optional[int]]:
+        """
+        删除 date_str 之前发布的文件并从清单中移除，返回 (被删除的文件记录, 被清理的最大 run_id)
+        之后重新下载过的文件属于新的 run_id，不会被清理
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                "SELECT path, package, version, filename, size, sha256, mtime_ns, run_id "
+                "FROM files JOIN runs USING (run_id) WHERE runs.date < ? ORDER BY path", (date_str,)
+            )
+            columns = [c[0] for c in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            max_run_id = self.conn.execute("SELECT MAX(run_id) FROM runs WHERE date < ?", (date_str,)).fetchone()[0]
+
+        removed = []
+        for row in rows:
+            try:
+                os.remove(self.full_path(row["path"]))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning(f"无法删除文件 {row['path']}: {e}")
+                continue
+            removed.append(row)
+
+        with self.lock:
+            for row in removed:
+                self.conn.execute("DELETE FROM files WHERE path = ?", (row["path"],))
+                self._touch(row["path"])
+            if len(removed) == len(rows):
+                self.conn.execute("DELETE FROM runs WHERE date < ?", (date_str,))
+            self.conn.commit()
+        return removed, max_run_id
+
+    def stats(self) -> Tuple[int, int, Optional[int]]:
+        """返回 (文件数, 总大小, 最新 run_id)"""
+        with self.lock:
+            count, size, run_id = self.conn.execute("SELECT COUNT(*), SUM(size), MAX(run_id) FROM files").fetchone()
+        return count, size or 0, run_id
+
+    def clear_files(self) -> int:
+        """按清单删除包目录中的所有文件并清空清单，返回删除的文件数"""
+        removed = 0
+        for rel_path in self.paths():
+            try:
+                os.remove(self.full_path(rel_path))
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning(f"无法删除文件 {rel_path}: {e}")
+                continue
+            with self.lock:
+                self.conn.execute("DELETE FROM files WHERE path = ?", (rel_path,))
+                self._touch(rel_path)
+        with self.lock:
+            self.conn.commit()
+        return removed
+
+    def prune_touched_dirs(self) -> int:
+        """
+        只检查本次运行中有变动的目录，自下而上删除空目录，返回删除的目录数量
+        """
+        with self.lock:
+            dirs = [row[0] for row in self.conn.execute("SELECT path FROM touched_dirs")]
+
+        # 加入各级上级目录，按深度从深到浅检查，保证子目录先于父目录删除
+        candidates = set()
+        for rel_dir in dirs:
+            parts = rel_dir.split("/")
+            for depth in range(1, len(parts) + 1):
+                candidates.add(tuple(parts[:depth]))
+
+        count = 0
+        for parts in sorted(candidates, key=len, reverse=True):
+            try:
+                os.rmdir(os.path.join(self.packages_dir, *parts))
+                count += 1
+                log.debug(f"删除: {'/'.join(parts)}")
+            except OSError:
+                pass  # 目录不为空或不存在
+
+        with self.lock:
+            self.conn.execute("DELETE FROM touched_dirs")
+            self.conn.commit()
+        return count
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+from utils.logger import log
+from utils.file_hash import hash_file_with_stat
+from utils.store_manifest import StoreManifest, has_manifest
+from utils.simple_index import SimpleIndexGenerator
+from core.retry_queue import RetryQueue, RETRY_QUEUE_PATH
+from config import VERIFY_PROCESSES
+
+PACKAGES_JSON_PATH = "data/packages.json"
+DOWNLOAD_BASE_DIR = "data/packages"
+VERIFY_STATE_PATH = "data/verify_state.json"
+
+
+class StoreVerifier:
+    """
+    包目录完整性校验（fsck）：
+    - 按包目录清单中记录的 sha256 校验实际保存的文件（没有清单时校验目录中已有的文件）
+    - 多进程并行计算哈希
+    - 大小和修改时间与上次校验一致的文件直接跳过
+    - 损坏或缺失的文件加入重试队列，下次下载时只重新获取这些文件
+    """
+
+    def __init__(self, json_path: str = PACKAGES_JSON_PATH, packages_dir: str = DOWNLOAD_BASE_DIR,
+                 state_path: str = VERIFY_STATE_PATH, processes: int = VERIFY_PROCESSES):
+        self.json_path = json_path
+        self.packages_dir = packages_dir
+        self.state_path = state_path
+        self.processes = processes or os.cpu_count()
+        self.packages_data: Dict[str, dict] = {}
+        self.fingerprints: Dict[str, dict] = {}  # 相对路径 -> {"size", "mtime_ns", "sha256"}
+
+    def load(self):
+        """加载包数据和上次校验的指纹"""
+        with open(self.json_path, 'r', encoding='utf-8') as f:
+            self.packages_data = json.load(f)
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.fingerprints = json.load(f)
+        except FileNotFoundError:
+            self.fingerprints = {}
+
+    def save_state(self):
+        """保存校验指纹"""
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump(self.fingerprints, f, indent=2, ensure_ascii=False)
+
+    def release_info(self, package_name: str, version: str, filename: str) -> dict:
+        """返回 packages.json 中记录的文件信息（url、sha256），旧版本的文件可能已不在其中"""
+        info = self.packages_data.get(package_name) or {}
+        return info.get("latest_releases", {}).get(version, {}).get(filename, {})
+
+    def collect_expected(self) -> List[dict]:
+        """
+        收集包目录中应存在的文件：以清单中实际保存的文件为准，而不是 latest_releases
+        （重试下载的文件可能单独出现在包目录中，同版本的其他文件并不在本地）
+        没有清单时遍历目录，只校验已有的文件
+
+        Returns:
+            [{"package", "version", "filename", "url", "sha256", "rel_path"}, ...]，url 未知时为 None
+        """
+        expected = []
+        if has_manifest(self.packages_dir):
+            manifest = StoreManifest(self.packages_dir)
+            try:
+                rows = manifest.rows()
+            finally:
+                manifest.close()
+            for row in rows:
+                expected.append({
+                    "package": row["package"],
+                    "version": row["version"],
+                    "filename": row["filename"],
+                    "url": self.release_info(row["package"], row["version"], row["filename"]).get("url"),
+                    "sha256": row["sha256"] or "",
+                    "rel_path": row["path"],
+                })
+            return expected
+
+        for root, dirs, files in os.walk(self.packages_dir):
+            for filename in files:
+                rel_path = os.path.relpath(os.path.join(root, filename), self.packages_dir).replace(os.sep, "/")
+                parts = rel_path.split("/")
+                if len(parts) != 3:
+                    continue
+                package_name, version, _ = parts
+                file_info = self.release_info(package_name, version, filename)
+                expected.append({
+                    "package": package_name,
+                    "version": version,
+                    "filename": filename,
+                    "url": file_info.get("url"),
+                    "sha256": file_info.get("sha256") or "",
+                    "rel_path": rel_path,
+                })
+        return expected
+
+    def verify(self) -> Dict[str, list]:
+        """
+        执行校验
+
+        Returns:
+            {"corrupt": [文件记录], "missing": [文件记录], "ok": [...], "skipped": [...]}，文件记录同 collect_expected
+        """
+        result = {"ok": [], "corrupt": [], "missing": [], "skipped": []}
+        to_hash = {}  # 绝对路径 -> 文件记录
+
+        expected = self.collect_expected()
+        # 丢弃已不在包目录中的文件指纹
+        expected_paths = {item["rel_path"] for item in expected}
+        self.fingerprints = {k: v for k, v in self.fingerprints.items() if k in expected_paths}
+
+        for item in expected:
+            rel_path, sha256 = item["rel_path"], item["sha256"]
+            path = os.path.join(self.packages_dir, rel_path)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                result["missing"].append(item)
+                self.fingerprints.pop(rel_path, None)
+                continue
+
+            fingerprint = self.fingerprints.get(rel_path)
+            if (fingerprint
+                    and fingerprint["size"] == stat.st_size
+                    and fingerprint["mtime_ns"] == stat.st_mtime_ns
+                    and fingerprint["sha256"].lower() == sha256.lower()):
+                result["skipped"].append(item)
+                continue
+
+            to_hash[path] = item
+
+        log.info(f"待校验 {len(to_hash)} 个文件，跳过未变化的 {len(result['skipped'])} 个文件，使用 {self.processes} 个进程")
+
+        if to_hash:
+            with ProcessPoolExecutor(max_workers=self.processes) as executor:
+                chunksize = max(1, len(to_hash) // (self.processes * 4))
+                for path, size, mtime_ns, file_hash in executor.map(hash_file_with_stat, to_hash, chunksize=chunksize):
+                    item = to_hash[path]
+                    rel_path, sha256 = item["rel_path"], item["sha256"]
+                    self.fingerprints[rel_path] = {"size": size, "mtime_ns": mtime_ns, "sha256": file_hash}
+                    if sha256 and file_hash.lower() != sha256.lower():
+                        log.warning(f"文件损坏: {rel_path} (expected {sha256}, got {file_hash})")
+                        result["corrupt"].append(item)
+                    else:
+                        result["ok"].append(item)
+
+        for item in result["missing"]:
+            log.warning(f"文件缺失: {item['rel_path']}")
+
+        return result
+
+    def requeue(self, result: Dict[str, list]) -> int:
+        """
+        删除损坏文件，并将损坏或缺失的文件从包目录清单和简单索引中移除，避免索引指向不存在的文件
+        再将其加入重试队列（立即到期），所属包标记为 retry_pending，重新下载成功后由发布流程恢复索引中的链接
+        不知道下载地址的文件（旧版本，已不在 latest_releases 中）无法重新下载，只从索引中移除
+
+        Returns:
+            重新排队的文件数量
+        """
+        retry_queue = RetryQueue(RETRY_QUEUE_PATH)
+        retry_queue.load()
+        manifest = StoreManifest(self.packages_dir) if has_manifest(self.packages_dir) else None
+
+        packages = set()
+        removed = []
+        unrecoverable = []
+        for reason, items, corrupt in (("校验失败: 哈希不匹配", result["corrupt"], True),
+                                       ("校验失败: 文件缺失", result["missing"], False)):
+            for item in items:
+                if corrupt:
+                    try:
+                        os.remove(os.path.join(self.packages_dir, item["rel_path"]))
+                    except OSError:
+                        log.warning(f"无法删除损坏文件 {item['rel_path']}")
+                    self.fingerprints.pop(item["rel_path"], None)
+                if manifest:
+                    manifest.remove(item["package"], item["version"], item["filename"])
+                removed.append(item)
+                if not item["url"]:
+                    log.warning(f"{item['rel_path']} 不在 latest_releases 中，无法重新下载")
+                    unrecoverable.append(item)
+                    continue
+                retry_queue.add(item["package"], item["version"], item["filename"], item["url"], item["sha256"],
+                                reason, delay=0)
+                packages.add(item["package"])
+        if manifest:
+            manifest.close()
+        if removed:
+            SimpleIndexGenerator(packages_dir=self.packages_dir).remove(removed)
+
+        if packages:
+            for package_name in packages:
+                self.packages_data[package_name]["status"] = "retry_pending"
+            retry_queue.save()
+            with open(self.json_path, 'w', encoding='utf-8') as f:
+                json.dump(self.packages_data, f, indent=2, ensure_ascii=False)
+            log.info(f"已将 {len(result['corrupt']) + len(result['missing']) - len(unrecoverable)} 个文件加入重试队列，"
+                     f"涉及包: {sorted(packages)}")
+        return len(result["corrupt"]) + len(result["missing"]) - len(unrecoverable)
+
+
+def main() -> bool:
+    """校验包目录，返回是否全部完好"""
+    start_time = time.time()
+    verifier = StoreVerifier()
+    verifier.load()
+    result = verifier.verify()
+    verifier.requeue(result)
+    verifier.save_state()
+
+    log.info(f"校验完成，耗时: {time.time() - start_time:.2f}秒")
+    log.info(f"完好 {len(result['ok'])}，跳过 {len(result['skipped'])}，"
+             f"损坏 {len(result['corrupt'])}，缺失 {len(result['missing'])}")
+    return not result["corrupt"] and not result["missing"]